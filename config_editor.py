@@ -1,13 +1,26 @@
 import json
 import os
+import sys
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 
 # Default configuration keys for each section.
 SOURCE_KEYS = ["server", "database", "username", "password", "schema"]
 TARGET_KEYS = ["server", "database", "username", "password", "schema"]
-DEFAULT_KEYS = ["batch_size", "threads", "log_max_size","log_backup_count"]
-TABLE_KEYS = ["table", "view", "target_table", "nonxml","incremental_column","incremental_value","enabled"]
+DEFAULT_KEYS = ["batch_size", "threads", "log_max_size","log_backup_count",
+                "autotune", "min_batch_size", "max_batch_size", "min_threads", "max_threads",
+                "sink", "output_dir", "output_compression", "output_max_file_size",
+                "data_compression", "columnstore", "tablock", "reload_mode",
+                "state_path", "lock_timeout", "lease_seconds", "max_attempts",
+                "serve_host", "serve_port", "poll_interval", "pool_size", "view_cache_seconds",
+                "server_projection", "spill_rows", "spill_dir",
+                "large_record_bytes", "large_record_chunk_bytes",
+                "verify", "reconcile_buckets", "reconcile_drill_rows", "profile_memory"]
+TABLE_KEYS = ["table", "view", "target_table", "nonxml","incremental_column","incremental_value","change_detection","enabled"]
+# Labels that differ from the key name.
+LABELS = {"incremental_value": "Incremental seed (first run)"}
+# Table keys edited with a True/False dropdown, and their default for new tables.
+BOOL_KEYS = {"nonxml": False, "change_detection": False, "enabled": True}
 
 # Default config file path (in a "config" subfolder)
 def get_base_dir():
@@ -40,7 +53,38 @@ DEFAULT_CONFIG = {
         "batch_size": 1000,
         "threads": 4,
         "log_max_size": 1048576,  # 1 MB in bytes
-        "log_backup_count": 5
+        "log_backup_count": 5,
+        "autotune": False,
+        "min_batch_size": 100,
+        "max_batch_size": 50000,
+        "min_threads": 1,
+        "max_threads": 16,
+        "sink": "sqlserver",
+        "output_dir": "output",
+        "output_compression": "gzip",
+        "output_max_file_size": 268435456,  # 256 MB per file
+        "data_compression": "NONE",
+        "columnstore": False,
+        "tablock": False,
+        "reload_mode": "drop",
+        "state_path": "state/run_state.sqlite",
+        "lock_timeout": 43200,  # seconds before a stale table lock can be taken over
+        "lease_seconds": 120,
+        "max_attempts": 3,
+        "serve_host": "127.0.0.1",
+        "serve_port": 8765,
+        "poll_interval": 0,  # seconds between micro-batch runs in service mode, 0 = on request only
+        "pool_size": 8,
+        "view_cache_seconds": 300,
+        "server_projection": False,
+        "spill_rows": 0,  # parsed rows kept in memory per table before spilling to disk, 0 = never spill
+        "spill_dir": "spill",
+        "large_record_bytes": 0,  # XML records above this DATALENGTH are streamed in chunks, 0 = off
+        "large_record_chunk_bytes": 1048576,
+        "verify": False,
+        "reconcile_buckets": 64,
+        "reconcile_drill_rows": 5000,
+        "profile_memory": False
     },
     "tables": [
         {
@@ -50,6 +94,7 @@ DEFAULT_CONFIG = {
             "nonxml": False,
             "incremental_column":"",
             "incremental_value":"",
+            "change_detection": False,
             "enabled": True
         },
         {
@@ -59,6 +104,7 @@ DEFAULT_CONFIG = {
             "nonxml": True,
             "incremental_column":"",
             "incremental_value":"",
+            "change_detection": False,
             "enabled": True
         }
     ]
@@ -94,22 +140,121 @@ entry_vars = {
     "target": {},
     "default": {}
 }
-# List to hold dictionaries for each table row.
-table_vars = []
+# The loaded configuration; keys not shown in the editor are kept when saving.
+current_config = {}
+# Table entries (dicts from the config) keyed by Treeview item id, and their order.
+tables_by_item = {}
+table_order = []
+# Variables of the edit pane for the selected table; changes are written straight to its entry.
+edit_vars = {}
+# Treeview item shown in the edit pane, and whether the pane is being filled (not edited).
+edited_item = None
+loading_pane = False
+
+def to_bool(value):
+    return str(value).lower() in ["true", "1", "yes"]
+
+def table_values(table):
+    """Return the Treeview column values for a table entry."""
+    values = []
+    for key in TABLE_KEYS:
+        if key in BOOL_KEYS:
+            values.append("True" if to_bool(table.get(key, BOOL_KEYS[key])) else "False")
+        else:
+            values.append(str(table.get(key, "")))
+    return values
 
 def update_ui(config_data):
+    global current_config, edited_item
+    current_config = config_data
+    edited_item = None
     # Update Source, Target, and Default sections based on expected keys.
+    # Keys missing from the file show their default value, so saving never writes empty settings.
     for section, keys in zip(["source", "target", "default"], [SOURCE_KEYS, TARGET_KEYS, DEFAULT_KEYS]):
         for key in keys:
+            entry_vars[section][key].delete(0, tk.END)
             if key in config_data.get(section, {}):
-                entry_vars[section][key].delete(0, tk.END)
                 entry_vars[section][key].insert(0, str(config_data[section][key]))
-    # Clear and update Tables section.
-    for widget in table_container.winfo_children():
-        widget.destroy()
-    table_vars.clear()
+            elif key in DEFAULT_CONFIG[section]:
+                entry_vars[section][key].insert(0, str(DEFAULT_CONFIG[section][key]))
+    # Reload the Tables list.
+    tables_by_item.clear()
+    table_order.clear()
     for table in config_data.get("tables", []):
-        add_table(table)
+        item = "t" + str(len(table_order))
+        tables_by_item[item] = table
+        table_order.append(item)
+    refresh_table_list()
+
+def refresh_table_list(*_):
+    """Fill the Treeview with the tables matching the search text (Treeview only draws visible rows)."""
+    search = search_var.get().strip().lower()
+    table_tree.delete(*table_tree.get_children())
+    for item in table_order:
+        table = tables_by_item[item]
+        if search and not any(search in str(table.get(key, "")).lower() for key in ("table", "view", "target_table")):
+            continue
+        table_tree.insert("", tk.END, iid=item, values=table_values(table))
+    table_count_var.set(f"{len(table_tree.get_children())} of {len(table_order)} tables")
+
+def on_table_select(event=None):
+    """Show the selected table in the edit pane (the first one if several are selected)."""
+    global edited_item, loading_pane
+    selection = table_tree.selection()
+    if not selection:
+        return
+    edited_item = selection[0]
+    table = tables_by_item[edited_item]
+    loading_pane = True
+    try:
+        for key in TABLE_KEYS:
+            if key in BOOL_KEYS:
+                edit_vars[key].set("True" if to_bool(table.get(key, BOOL_KEYS[key])) else "False")
+            else:
+                edit_vars[key].set(str(table.get(key, "")))
+    finally:
+        loading_pane = False
+
+def on_table_edit(key):
+    """Write a changed edit pane field through to the table shown in the pane (like the old per-table entries)."""
+    if loading_pane or edited_item not in tables_by_item:
+        return
+    table = tables_by_item[edited_item]
+    table[key] = to_bool(edit_vars[key].get()) if key in BOOL_KEYS else edit_vars[key].get()
+    if table_tree.exists(edited_item):
+        table_tree.item(edited_item, values=table_values(table))
+
+def add_table(existing_data=None):
+    table = dict(existing_data) if existing_data else {key: BOOL_KEYS.get(key, "") for key in TABLE_KEYS}
+    item = "t" + str(len(tables_by_item))
+    while item in tables_by_item:
+        item += "_"
+    tables_by_item[item] = table
+    table_order.append(item)
+    search_var.set("")
+    refresh_table_list()
+    table_tree.selection_set(item)
+    table_tree.see(item)
+    on_table_select()
+
+def remove_tables():
+    selection = table_tree.selection()
+    if not selection:
+        return
+    if not messagebox.askyesno("Tables", f"Remove {len(selection)} selected table(s)?"):
+        return
+    for item in selection:
+        tables_by_item.pop(item, None)
+        table_order.remove(item)
+    refresh_table_list()
+
+def set_enabled_selected(enabled):
+    """Bulk enable/disable the selected tables (all visible tables if nothing is selected)."""
+    items = table_tree.selection() or table_tree.get_children()
+    for item in items:
+        tables_by_item[item]["enabled"] = enabled
+        table_tree.item(item, values=table_values(tables_by_item[item]))
+    on_table_select()
 
 def browse_config():
     global CONFIG_FILE
@@ -120,94 +265,20 @@ def browse_config():
 
 def save_config_ui():
     try:
-        new_data = {
-            "source": {key: entry_vars["source"][key].get() for key in SOURCE_KEYS},
-            "target": {key: entry_vars["target"][key].get() for key in TARGET_KEYS},
-            "default": {key: entry_vars["default"][key].get() for key in DEFAULT_KEYS},
-            "tables": [{key: table_vars[i][key].get() for key in table_vars[i]} for i in range(len(table_vars))]
-        }
-        # Convert nonxml field to Boolean for each table.
-        for table in new_data["tables"]:
-            val = str(table.get("nonxml", "")).lower()
-            table["nonxml"] = True if val in ["true", "1", "yes"] else False
-        # Convert enabled field to Boolean for each table.
+        new_data = dict(current_config)
+        for section, keys in zip(["source", "target", "default"], [SOURCE_KEYS, TARGET_KEYS, DEFAULT_KEYS]):
+            new_data[section] = dict(current_config.get(section, {}))
+            new_data[section].update({key: entry_vars[section][key].get() for key in keys})
+        new_data["tables"] = [tables_by_item[item] for item in table_order]
+        # Convert the True/False fields to Boolean for each table.
         for table in new_data["tables"]:
-            val = str(table.get("enabled", "")).lower()
-            table["enabled"] = True if val in ["true", "1", "yes"] else False
+            for key, default in BOOL_KEYS.items():
+                table[key] = to_bool(table.get(key, default))
         save_config(new_data, CONFIG_FILE)
         messagebox.showinfo("Success", "Config file saved successfully!")
     except Exception as e:
         messagebox.showerror("Error", f"Failed to save config: {e}")
 
-# def add_table(existing_data=None):
-    # i = len(table_vars)
-    # table_vars.append({})
-    
-    # row_frame = tk.Frame(table_container, bd=2, relief="groove", padx=5, pady=5)
-    # row_frame.pack(fill="x", pady=3, padx=5)
-    
-    # for key in TABLE_KEYS:
-        # sub_frame = tk.Frame(row_frame)
-        # sub_frame.pack(fill="x", pady=2)
-        # tk.Label(sub_frame, text=key.replace("_"," ").capitalize()+":", width=20, anchor="w").pack(side="left", padx=5)
-        # entry = tk.Entry(sub_frame, width=40)
-        # entry.pack(side="left", padx=5)
-        # if existing_data and key in existing_data:
-            # entry.insert(0, str(existing_data[key]))
-        # table_vars[i][key] = entry
-
-    # remove_button = tk.Button(row_frame, text="❌", command=lambda: remove_table(row_frame, i))
-    # remove_button.pack(side="right", padx=5)
-def add_table(existing_data=None):
-    i = len(table_vars)
-    table_vars.append({})
-    
-    row_frame = tk.Frame(table_container, bd=2, relief="groove", padx=5, pady=5)
-    row_frame.pack(fill="x", pady=3, padx=5)
-    
-    for key in TABLE_KEYS:
-        sub_frame = tk.Frame(row_frame)
-        sub_frame.pack(fill="x", pady=2)
-        tk.Label(sub_frame, text=key.replace("_"," ").capitalize()+":", width=20, anchor="w").pack(side="left", padx=5)
-        
-        if key == "nonxml":
-            # Create a dropdown (OptionMenu) for nonxml with options "True" and "False"
-            var = tk.StringVar()
-            # If existing_data is provided, use its value; otherwise, default to "False"
-            if existing_data and key in existing_data:
-                var.set("True" if str(existing_data[key]).lower() in ["true", "1", "yes"] else "False")
-            else:
-                var.set("False")
-            option_menu = tk.OptionMenu(sub_frame, var, "True", "False")
-            option_menu.pack(side="left", padx=5)
-            table_vars[i][key] = var
-        elif key == "enabled":
-             # Create a dropdown (OptionMenu) for enabled with options "True" and "False"
-            var = tk.StringVar()
-            # If existing_data is provided, use its value; otherwise, default to "False"
-            if existing_data and key in existing_data:
-                var.set("True" if str(existing_data[key]).lower() in ["true", "1", "yes"] else "False")
-            else:
-                var.set("True")
-            option_menu = tk.OptionMenu(sub_frame, var, "True", "False")
-            option_menu.pack(side="left", padx=5)
-            table_vars[i][key] = var       
-        else:
-            var = tk.StringVar(value=str(existing_data[key]) if existing_data and key in existing_data else "")
-            entry = tk.Entry(sub_frame, textvariable=var, width=40)
-            entry.pack(side="left", padx=5)
-            table_vars[i][key] = var
-
-    remove_button = tk.Button(row_frame, text="❌", command=lambda: remove_table(row_frame, i))
-    remove_button.pack(side="right", padx=5)
-
-def remove_table(frame, index):
-    frame.destroy()
-    try:
-        table_vars.pop(index)
-    except Exception as e:
-        print(f"Error removing table: {e}")
-
 # Build the main GUI window.
 root = tk.Tk()
 root.title("Config Editor")
@@ -249,12 +320,52 @@ for section, keys in sections:
 # Add Tables section to scrollable_frame.
 tables_frame = tk.LabelFrame(scrollable_frame, text="Tables", padx=10, pady=5)
 tables_frame.pack(fill="both", padx=10, pady=5)
-# Create a dedicated container for table rows.
-table_container = tk.Frame(tables_frame)
-table_container.pack(fill="both", expand=True)
 
-# Add Table button inside the tables_frame (this button will scroll with the content)
-tk.Button(tables_frame, text="➕ Add Table", command=add_table).pack(pady=5)
+# Search box filtering on table, view and target table.
+search_frame = tk.Frame(tables_frame)
+search_frame.pack(fill="x", pady=2)
+tk.Label(search_frame, text="Search:").pack(side="left", padx=5)
+search_var = tk.StringVar()
+search_var.trace_add("write", refresh_table_list)
+tk.Entry(search_frame, textvariable=search_var, width=30).pack(side="left", padx=5)
+table_count_var = tk.StringVar()
+tk.Label(search_frame, textvariable=table_count_var).pack(side="left", padx=5)
+
+# Table list: a Treeview only creates canvas items for visible rows, so large configs open instantly.
+list_frame = tk.Frame(tables_frame)
+list_frame.pack(fill="both", expand=True)
+table_tree = ttk.Treeview(list_frame, columns=TABLE_KEYS, show="headings", height=12, selectmode="extended")
+for key in TABLE_KEYS:
+    table_tree.heading(key, text=LABELS.get(key, key.replace("_", " ").capitalize()))
+    table_tree.column(key, width=70 if key in BOOL_KEYS else 110, stretch=True)
+tree_scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=table_tree.yview)
+table_tree.configure(yscrollcommand=tree_scrollbar.set)
+table_tree.pack(side="left", fill="both", expand=True)
+tree_scrollbar.pack(side="right", fill="y")
+table_tree.bind("<<TreeviewSelect>>", on_table_select)
+
+# Buttons for the list (bulk operations apply to the selected rows).
+list_buttons = tk.Frame(tables_frame)
+list_buttons.pack(fill="x", pady=5)
+tk.Button(list_buttons, text="➕ Add Table", command=add_table).pack(side="left", padx=5)
+tk.Button(list_buttons, text="❌ Remove Selected", command=remove_tables).pack(side="left", padx=5)
+tk.Button(list_buttons, text="Enable Selected", command=lambda: set_enabled_selected(True)).pack(side="left", padx=5)
+tk.Button(list_buttons, text="Disable Selected", command=lambda: set_enabled_selected(False)).pack(side="left", padx=5)
+
+# Edit pane for the selected table.
+edit_frame = tk.LabelFrame(tables_frame, text="Selected table", padx=10, pady=5)
+edit_frame.pack(fill="x", pady=5)
+for i, key in enumerate(TABLE_KEYS):
+    tk.Label(edit_frame, text=LABELS.get(key, key.replace("_"," ").capitalize())+":", width=24, anchor="w").grid(row=i, column=0, padx=10, pady=2)
+    var = tk.StringVar()
+    if key in BOOL_KEYS:
+        # Create a dropdown (OptionMenu) with options "True" and "False"
+        var.set("True" if BOOL_KEYS[key] else "False")
+        tk.OptionMenu(edit_frame, var, "True", "False").grid(row=i, column=1, padx=10, pady=2, sticky="w")
+    else:
+        tk.Entry(edit_frame, textvariable=var, width=50).grid(row=i, column=1, padx=10, pady=2)
+    var.trace_add("write", lambda *_, key=key: on_table_edit(key))
+    edit_vars[key] = var
 
 # Fixed bottom frame for config file operations.
 button_frame = tk.Frame(root)
@@ -0,0 +1,137 @@
+# data_loader/change_detection.py
+import os
+import uuid
+import hashlib
+import sqlite3
+from .config import get_base_dir
+from .state import is_network_path, default_owner
+from .logging import logger
+
+# Default directory holding the per-table RECID -> hash indexes (next to the default state database).
+STATE_DIR = os.path.join(get_base_dir(), "state")
+
+# Number of index updates buffered before they are written to SQLite.
+INDEX_WRITE_BATCH = 10000
+
+def hash_record(xml_record):
+    """Return a compact content hash (16 bytes) of an XMLRECORD value."""
+    if xml_record is None:
+        xml_record = ""
+    return hashlib.blake2b(xml_record.encode("utf-8"), digest_size=16).digest()
+
+class ChangeTracker:
+    """
+    Keep a local SQLite index of RECID -> XMLRECORD hash for one target table.
+
+    During a run every source row is passed to check(); rows whose hash is
+    unchanged are skipped before parsing. RECIDs present in the index but not
+    seen in the source are reported as deleted. The index is only updated when
+    commit() is called, i.e. after the rows were loaded successfully.
+
+    With a state store (see state.StateStore) every commit gets a new token that is
+    recorded both in the index and in the state store. An index whose token does not
+    match the state store is stale (another host loaded the table since) and is reset,
+    so the next run is a full load instead of a delta against outdated hashes.
+    """
+
+    def __init__(self, target_table, state_dir=None, state=None):
+        state_dir = state_dir or STATE_DIR
+        if not os.path.exists(state_dir):
+            os.makedirs(state_dir)
+        self.target_table = target_table
+        self.state = state
+        self.index_path = os.path.join(state_dir, f"{target_table}.hashidx.sqlite")
+        self.conn = sqlite3.connect(self.index_path)
+        if is_network_path(self.index_path):
+            self.conn.execute("PRAGMA journal_mode=DELETE")
+        else:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS record_hash ("
+            " recid TEXT PRIMARY KEY,"
+            " hash BLOB NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        # Hashes of every row seen in this run are staged here until commit().
+        self.conn.execute(
+            "CREATE TEMP TABLE staged_hash (recid TEXT PRIMARY KEY, hash BLOB NOT NULL) WITHOUT ROWID"
+        )
+        self.conn.commit()
+        self.initial = self.conn.execute("SELECT 1 FROM record_hash LIMIT 1").fetchone() is None
+        if not self.initial and state is not None:
+            row = self.conn.execute("SELECT value FROM index_meta WHERE key = 'token'").fetchone()
+            committed = state.get_index_token(target_table)
+            # No token in the state store yet: the index predates token tracking and is trusted.
+            if committed is not None and (row is None or row[0] != committed[0]):
+                logger.warning(f"Change index {self.index_path} is out of date (table last loaded by {committed[1]}); "
+                               f"performing a full load.")
+                self.reset()
+        self.inserted = 0
+        self.new_recids = []
+        self.changed_recids = []
+        self.unchanged = 0
+        self._pending = []
+
+    def reset(self):
+        """Forget all stored hashes so every row is treated as new (e.g. the target table was dropped)."""
+        with self.conn:
+            self.conn.execute("DELETE FROM record_hash")
+        self.initial = True
+
+    def check(self, recid, xml_record):
+        """
+        Return True if the row is new or changed and must be parsed and loaded.
+        Unchanged rows are only recorded as seen.
+        """
+        return self.check_hash(recid, hash_record(xml_record))
+
+    def check_hash(self, recid, new_hash):
+        """Like check(), for a hash computed by the caller (large records are hashed on the server)."""
+        self._pending.append((recid, new_hash))
+        self._flush_if_needed()
+        row = self.conn.execute("SELECT hash FROM record_hash WHERE recid = ?", (recid,)).fetchone()
+        if row is None:
+            self.inserted += 1
+            self.new_recids.append(recid)
+            return True
+        if row[0] != new_hash:
+            self.changed_recids.append(recid)
+            return True
+        self.unchanged += 1
+        return False
+
+    def _flush_if_needed(self, force=False):
+        if self._pending and (force or len(self._pending) >= INDEX_WRITE_BATCH):
+            self.conn.executemany("INSERT OR REPLACE INTO staged_hash (recid, hash) VALUES (?, ?)", self._pending)
+            self._pending = []
+
+    def deleted_recids(self):
+        """Return the RECIDs that are in the index but were not seen in the source during this run."""
+        self._flush_if_needed(force=True)
+        rows = self.conn.execute(
+            "SELECT recid FROM record_hash r"
+            " WHERE NOT EXISTS (SELECT 1 FROM temp.staged_hash s WHERE s.recid = r.recid)"
+        )
+        return [r[0] for r in rows]
+
+    def commit(self):
+        """Replace the index with the hashes seen in this run (inserted, changed and unchanged rows)."""
+        self._flush_if_needed(force=True)
+        token = uuid.uuid4().hex
+        with self.conn:
+            self.conn.execute("DELETE FROM record_hash")
+            self.conn.execute("INSERT INTO record_hash (recid, hash) SELECT recid, hash FROM temp.staged_hash")
+            self.conn.execute("DELETE FROM temp.staged_hash")
+            self.conn.execute("INSERT OR REPLACE INTO index_meta (key, value) VALUES ('token', ?)", (token,))
+        # If this fails after the local commit the tokens differ and the next run is a (safe) full load.
+        if self.state is not None:
+            self.state.set_index_token(self.target_table, token, default_owner())
+        logger.info(
+            f"Change index {self.index_path} updated: {self.inserted} inserted, "
+            f"{len(self.changed_recids)} changed, {self.unchanged} unchanged rows."
+        )
+
+    def close(self):
+        self.conn.close()
@@ -33,7 +33,38 @@ DEFAULT_CONFIG = {
         "batch_size": 1000,
         "threads": 4,
         "log_max_size": 1048576,  # 1 MB in bytes
-        "log_backup_count": 5
+        "log_backup_count": 5,
+        "autotune": False,
+        "min_batch_size": 100,
+        "max_batch_size": 50000,
+        "min_threads": 1,
+        "max_threads": 16,
+        "sink": "sqlserver",
+        "output_dir": "output",
+        "output_compression": "gzip",
+        "output_max_file_size": 268435456,  # 256 MB per file
+        "data_compression": "NONE",
+        "columnstore": False,
+        "tablock": False,
+        "reload_mode": "drop",
+        "state_path": "state/run_state.sqlite",
+        "lock_timeout": 43200,  # seconds before a stale table lock can be taken over
+        "lease_seconds": 120,
+        "max_attempts": 3,
+        "serve_host": "127.0.0.1",
+        "serve_port": 8765,
+        "poll_interval": 0,  # seconds between micro-batch runs in service mode, 0 = on request only
+        "pool_size": 8,
+        "view_cache_seconds": 300,
+        "server_projection": False,
+        "spill_rows": 0,  # parsed rows kept in memory per table before spilling to disk, 0 = never spill
+        "spill_dir": "spill",
+        "large_record_bytes": 0,  # XML records above this DATALENGTH are streamed in chunks, 0 = off
+        "large_record_chunk_bytes": 1048576,
+        "verify": False,
+        "reconcile_buckets": 64,
+        "reconcile_drill_rows": 5000,
+        "profile_memory": False
     },
     "tables": [
         {
@@ -43,6 +74,7 @@ DEFAULT_CONFIG = {
             "nonxml": False,
             "incremental_column":"",
             "incremental_value":"",
+            "change_detection": False,
             "enabled": True
         },
         {
@@ -52,11 +84,20 @@ DEFAULT_CONFIG = {
             "nonxml": True,
             "incremental_column":"",
             "incremental_value":"",
+            "change_detection": False,
             "enabled": True
         }
     ]
 }
  
+def get_bool_option(default_conf, tbl, key, default=False):
+    """
+    Return a boolean option; the table value overrides the default section. Accepts real
+    booleans and the strings the config editor saves ("True"/"False", also "1"/"yes").
+    """
+    value = tbl.get(key, default_conf.get(key, default))
+    return str(value).lower() in ["true", "1", "yes"]
+
 def ensure_config():
     """Ensure that the configuration directory and file exist; if not, create them with default config."""
     if not os.path.exists(CONFIG_DIR):
@@ -71,6 +112,10 @@ def load_config(config_path=None):
     config_path = config_path or ensure_config()
     with open(config_path, "r", encoding="utf-8") as f:
         config = json.load(f)
+    # The config editor saves unset default keys as ""; treat those as not set so the built-in defaults apply.
+    default_conf = config.get("default")
+    if isinstance(default_conf, dict):
+        config["default"] = {key: value for key, value in default_conf.items() if value != ""}
     return config
 
 def save_config(config_data, config_path=None):
@@ -1,9 +1,22 @@
 # data_loader/database.py
+import threading
 import pyodbc
 from data_loader.logging import logger
 
+# Idle connections kept per server/database when pooling is enabled (service mode).
+_pools = None
+_pools_lock = threading.Lock()
+_pool_size = 0
+
 def get_connection(server, database, username, password):
-    """Establish a connection to SQL Server."""
+    """Establish a connection to SQL Server (taken from the pool when pooling is enabled)."""
+    if _pools is not None:
+        key = (server, database, username, password)
+        with _pools_lock:
+            idle = _pools.setdefault(key, [])
+            connection = idle.pop() if idle else None
+        if connection is not None and is_alive(connection):
+            return PooledConnection(connection, key)
     conn_str = (
         f"DRIVER={{ODBC Driver 17 for SQL Server}};"
         f"SERVER={server};"
@@ -14,7 +27,71 @@ def get_connection(server, database, username, password):
     try:
         connection = pyodbc.connect(conn_str)
         # logger.info(f"Successfully connected to {database} database on {server} server.")
+        if _pools is not None:
+            return PooledConnection(connection, (server, database, username, password))
         return connection
     except Exception as e:
         logger.error(f"Error connecting to SQL Server '{server}' on database '{database}': {e}. Verify the connection sitring is configured properly in ./config/config.json file. If first execution config folder would be auto created")
         raise  # Optionally, you can choose to return None instead of raising the exception.
+
+def is_alive(connection):
+    """Check an idle pooled connection with a trivial query; dead connections are closed."""
+    try:
+        connection.cursor().execute("SELECT 1").fetchone()
+        return True
+    except Exception:
+        try:
+            connection.close()
+        except Exception:
+            pass
+        return False
+
+def enable_pooling(pool_size=8):
+    """Keep up to pool_size idle connections per server/database instead of closing them (used by --serve)."""
+    global _pools, _pool_size
+    with _pools_lock:
+        if _pools is None:
+            _pools = {}
+        _pool_size = int(pool_size)
+
+def close_pooled_connections():
+    """Close all idle pooled connections."""
+    with _pools_lock:
+        idle = [conn for conns in (_pools or {}).values() for conn in conns]
+        for conns in (_pools or {}).values():
+            conns.clear()
+    for conn in idle:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+class PooledConnection:
+    """
+    pyodbc connection wrapper whose close() rolls back any open transaction and returns the
+    connection to the pool. Connections that fail the rollback, or exceed the pool size, are closed.
+    """
+
+    def __init__(self, connection, key):
+        self._connection = connection
+        self._key = key
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def close(self):
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        try:
+            connection.rollback()
+        except Exception as e:
+            logger.debug(f"Discarding pooled connection to '{self._key[1]}': {e}")
+            connection.close()
+            return
+        with _pools_lock:
+            idle = _pools.setdefault(self._key, []) if _pools is not None else None
+            if idle is not None and len(idle) < _pool_size:
+                idle.append(connection)
+                return
+        connection.close()
@@ -1,14 +1,42 @@
 # data_loader/extraction.py
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from .processing import parse_extracted_xml_record, parse_delimited_record
+import time
+import codecs
+import pyodbc
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+from .processing import RowBatch, build_header, parse_xml_batch, parse_xml_stream, parse_delimited_batch
 from .database import get_connection
 from .logging import logger
+from .tuning import StageTuner
+
+# View definitions cached per (database, view name) as (definition, expiry) when enabled (service mode).
+_view_cache = None
+_view_cache_seconds = 0
+
+def enable_view_cache(seconds=300):
+    """Cache view definitions for the given number of seconds (used by --serve)."""
+    global _view_cache, _view_cache_seconds
+    _view_cache = {}
+    _view_cache_seconds = seconds
 
 def get_view_definition(cursor, view_name):
     """
-    Retrieve the view definition from sys.sql_modules using the view name.
+    Retrieve the view definition from sys.sql_modules using the view name
+    (from the cache when it is enabled).
     """
+    if _view_cache is not None:
+        key = (cursor.connection.getinfo(pyodbc.SQL_DATABASE_NAME), view_name)
+        cached = _view_cache.get(key)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        definition = read_view_definition(cursor, view_name)
+        if definition is not None:
+            _view_cache[key] = (definition, time.monotonic() + _view_cache_seconds)
+        return definition
+    return read_view_definition(cursor, view_name)
+
+def read_view_definition(cursor, view_name):
+    """Read the view definition from sys.sql_modules."""
     query = """
     SELECT m.definition
     FROM sys.sql_modules m
@@ -19,31 +47,149 @@ def get_view_definition(cursor, view_name):
     row = cursor.fetchone()
     return row.definition if row else None
 
-def process_rows(src_cursor, batch_size, thread_count, nonxml):
+def source_columns(mapping, nonxml, projection=False):
+    """
+    Return the select list (RECID and an XMLRECORD column) for the source query of a mapping.
+
+    Non-XML mappings that only use tafjfield read everything from RECID, so XMLRECORD is
+    replaced by an empty string. With projection, XML records are reduced on the server
+    to the mapped elements (XMLRECORD.query), so only those cross the network.
+    """
+    if nonxml:
+        if all(func == "tafjfield" for _, _, func in mapping):
+            return "RECID, N'' AS XMLRECORD"
+        return "RECID, XMLRECORD"
+    return f"RECID, {source_xml_expression(mapping, projection)} AS XMLRECORD"
+
+def source_xml_expression(mapping, projection=False):
+    """Return the SQL expression fetched as XMLRECORD for an XML mapping (see source_columns)."""
+    if projection:
+        tags = list(dict.fromkeys(tag for tag, _ in mapping))
+        paths = ", ".join(f"/row/{tag}" for tag in tags)
+        return f"CAST(XMLRECORD.query('<row>{{{paths}}}</row>') AS NVARCHAR(MAX))"
+    return "XMLRECORD"
+
+# Server-side content hash of a large record for change detection, so unchanged records are
+# neither fetched nor parsed (HASHBYTES accepts inputs over 8000 bytes from SQL Server 2016).
+LARGE_RECORD_HASH = "HASHBYTES('SHA2_256', CAST(CAST({expression} AS NVARCHAR(MAX)) AS VARBINARY(MAX)))"
+
+def fetch_record_chunks(cursor, source_table_full, recid, expression, chunk_bytes):
+    """
+    Yield the text of one record's XMLRECORD expression in pieces of chunk_bytes.
+    The value is read as UTF-16 bytes with SUBSTRING and decoded incrementally, so
+    characters split across chunks are joined correctly.
+    """
+    decoder = codecs.getincrementaldecoder("utf-16-le")()
+    query = (f"SELECT SUBSTRING(CAST(CAST({expression} AS NVARCHAR(MAX)) AS VARBINARY(MAX)), ?, ?) AS chunk "
+             f"FROM {source_table_full} WITH (NOLOCK) WHERE RECID = ?")
+    position = 1
+    while True:
+        cursor.execute(query, (position, chunk_bytes, recid))
+        row = cursor.fetchone()
+        data = row.chunk if row else None
+        if not data:
+            break
+        text = decoder.decode(data)
+        if text:
+            yield text
+        if len(data) < chunk_bytes:
+            break
+        position += len(data)
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+def process_large_records(src_conn, source_table_full, mapping, min_bytes, chunk_bytes, projection=False,
+                          hash_filter=None, batch_filter=None, results=None):
+    """
+    Load the XML records larger than min_bytes (DATALENGTH), which the main query leaves out.
+    Each record is fetched in chunks of chunk_bytes and parsed with parse_xml_stream, so
+    neither the full string nor a full element tree is ever held in memory.
+    hash_filter(recid, digest) plays the role of row_filter for change detection: the hash
+    is computed on the server (LARGE_RECORD_HASH) and unchanged records are skipped before
+    they are fetched. batch_filter and results are used as in process_rows. Returns results.
+    """
+    if results is None:
+        results = RowBatch(build_header(mapping, False))
+    chunk_bytes = max(2, chunk_bytes - chunk_bytes % 2)
+    expression = source_xml_expression(mapping, projection)
+    cursor = src_conn.cursor()
+    if hash_filter is not None:
+        cursor.execute(f"SELECT RECID, {LARGE_RECORD_HASH.format(expression=expression)} AS record_hash "
+                       f"FROM {source_table_full} WITH (NOLOCK) WHERE DATALENGTH(XMLRECORD) > ?", (min_bytes,))
+        rows = cursor.fetchall()
+        recids = [row.RECID for row in rows if hash_filter(row.RECID, bytes(row.record_hash or b""))]
+        if len(recids) < len(rows):
+            logger.info(f"Skipping {len(rows) - len(recids)} unchanged records larger than {min_bytes} bytes.")
+    else:
+        cursor.execute(f"SELECT RECID FROM {source_table_full} WITH (NOLOCK) WHERE DATALENGTH(XMLRECORD) > ?", (min_bytes,))
+        recids = [row.RECID for row in cursor.fetchall()]
+    if not recids:
+        cursor.close()
+        return results
+    logger.info(f"Streaming {len(recids)} records larger than {min_bytes} bytes from {source_table_full} "
+                f"in chunks of {chunk_bytes} bytes.")
+    for recid in recids:
+        batch = parse_xml_stream(recid, fetch_record_chunks(cursor, source_table_full, recid, expression, chunk_bytes),
+                                 mapping)
+        if batch_filter is not None:
+            batch_filter(batch)
+        results.extend(batch)
+    cursor.close()
+    return results
+
+def parse_batch(batch, nonxml, mapping):
+    """Parse a list of (RECID, XMLRECORD) pairs into a RowBatch with the mapped columns."""
+    if nonxml:
+        # For non-XML, we use the RECID field for tafjfield splitting and XMLRECORD for extractValueJS splitting.
+        return parse_delimited_batch(batch, mapping)
+    return parse_xml_batch(batch, mapping)
+
+def process_rows(src_cursor, batch_size, thread_count, nonxml, mapping, row_filter=None, fetch_tuner=None,
+                 parse_tuner=None, batch_filter=None, results=None):
     """
     Process rows from the source table in batches using multiple threads.
     Depending on the flag, use XML processing or non-XML processing.
-    Returns a list of tuples (RECID, record).
-    """
-    # erecords = src_cursor.fetchall()
-    # # Count the total number of records
-    # total_erecords = len(erecords)
-    # logger.info(f"Total number of extracted records to process: {total_erecords}")
-    results = []
-    with ThreadPoolExecutor(max_workers=thread_count) as executor:
-        futures = []
+    If row_filter is given, rows for which row_filter(recid, xmlrecord) is False are not parsed.
+    fetch_tuner/parse_tuner (see tuning.StageTuner) adapt the fetch size and the number of
+    batches parsed concurrently; without them batch_size and thread_count are used as is.
+    batch_filter, if given, is called with every parsed RowBatch (in this thread) before it
+    is added to results (a RowBatch or spill.SpillBuffer; a new RowBatch by default).
+    Returns results with RECID and the mapped columns.
+    """
+    fetch_tuner = fetch_tuner or StageTuner("fetch_size", batch_size)
+    parse_tuner = parse_tuner or StageTuner("parse_threads", thread_count)
+    if results is None:
+        results = RowBatch(build_header(mapping, nonxml))
+    pending = set()
+
+    def collect(return_when):
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            pending.remove(future)
+            batch_results = future.result()
+            parse_tuner.record(len(batch_results))
+            if batch_filter is not None:
+                batch_filter(batch_results)
+            results.extend(batch_results)
+
+    with ThreadPoolExecutor(max_workers=parse_tuner.maximum) as executor:
         while True:
-            batch = src_cursor.fetchmany(batch_size)
+            started = time.perf_counter()
+            batch = src_cursor.fetchmany(fetch_tuner.value)
             if not batch:
                 break
-            for row in batch:
-                recid = row.RECID
-                xmlrecord = row.XMLRECORD
-                if nonxml:
-                    # For non-XML, we use the RECID field for tafjfield splitting and XMLRECORD for extractValueJS splitting.
-                    futures.append(executor.submit(parse_delimited_record, recid, recid, xmlrecord))
-                else:
-                    futures.append(executor.submit(parse_extracted_xml_record, recid, xmlrecord))
-        for future in as_completed(futures):
-            results.append(future.result())
+            fetch_tuner.record(len(batch), time.perf_counter() - started)
+            if row_filter is not None:
+                batch = [(row.RECID, row.XMLRECORD) for row in batch if row_filter(row.RECID, row.XMLRECORD)]
+            else:
+                batch = [(row.RECID, row.XMLRECORD) for row in batch]
+            if not batch:
+                continue
+            # Keep at most parse_threads batches in flight.
+            while len(pending) >= parse_tuner.value:
+                collect(FIRST_COMPLETED)
+            pending.add(executor.submit(parse_batch, batch, nonxml, mapping))
+        if pending:
+            collect(ALL_COMPLETED)
     return results
@@ -1,30 +1,148 @@
 # data_loader/loader.py
-from math import ceil
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .config import get_bool_option
 from .database import get_connection
 from .logging import logger
+from .tuning import StageTuner
 
-def create_target_table(target_conn, target_schema, target_table, header):
+# Minimum number of seconds between two progress log lines of a load.
+PROGRESS_INTERVAL = 2.0
+
+# Allowed values of the data_compression table option.
+DATA_COMPRESSION_OPTIONS = ["NONE", "ROW", "PAGE"]
+
+# Rows per insert needed for a columnstore load to go straight into compressed rowgroups.
+COLUMNSTORE_MIN_ROWGROUP = 102400
+
+def get_storage_options(default_conf, tbl):
+    """
+    Return the physical layout / load options of a target table:
+    data_compression (NONE, ROW or PAGE), columnstore (clustered columnstore index)
+    and tablock (minimally logged INSERT ... SELECT WITH (TABLOCK) loads).
+    Table values override the default section.
+    """
+    def option(key, default):
+        return tbl.get(key, default_conf.get(key, default))
+
+    data_compression = str(option("data_compression", "NONE") or "NONE").upper()
+    if data_compression not in DATA_COMPRESSION_OPTIONS:
+        raise ValueError(f"Invalid data_compression '{data_compression}' for table '{tbl['table']}'. "
+                         f"Use one of: {', '.join(DATA_COMPRESSION_OPTIONS)}.")
+    return {
+        "data_compression": data_compression,
+        "columnstore": get_bool_option(default_conf, tbl, "columnstore"),
+        "tablock": get_bool_option(default_conf, tbl, "tablock"),
+    }
+
+def create_target_table(target_conn, target_schema, target_table, header, storage=None, column_types=None):
     """
     Drop the target table if it exists and then create it.
-    All columns are NVARCHAR(MAX). Fully qualified name: [schema].[table]
+    Columns are NVARCHAR(MAX) unless column_types ({column: type}, e.g. index key columns) says otherwise.
+    Fully qualified name: [schema].[table]
+    storage (see get_storage_options) selects a clustered columnstore index or ROW/PAGE compression.
     """
+    storage = storage or {}
+    column_types = column_types or {}
     cursor = target_conn.cursor()
     table_full_name = f"[{target_schema}].[{target_table}]"
     drop_query = f"DROP TABLE IF EXISTS {table_full_name};"
     logger.info(f"Dropping target table {table_full_name} if it exists...")
     cursor.execute(drop_query)
-    columns_def = ",\n".join([f"[{col}] NVARCHAR(MAX)" for col in header])
-    create_query = f"CREATE TABLE {table_full_name} (\n{columns_def}\n);"
+    columns_def = ",\n".join([f"[{col}] {column_types.get(col, 'NVARCHAR(MAX)')}" for col in header])
+    data_compression = storage.get("data_compression", "NONE")
+    if storage.get("columnstore"):
+        if data_compression != "NONE":
+            logger.warning(f"data_compression {data_compression} is ignored for columnstore table {table_full_name}.")
+        create_query = f"CREATE TABLE {table_full_name} (\n{columns_def}\n);"
+    else:
+        create_query = f"CREATE TABLE {table_full_name} (\n{columns_def}\n) WITH (DATA_COMPRESSION = {data_compression});"
     logger.info(f"Creating target table {table_full_name}.")
     cursor.execute(create_query)
+    if storage.get("columnstore"):
+        # NVARCHAR(MAX) columns in a clustered columnstore index require SQL Server 2017 or later.
+        logger.info(f"Creating clustered columnstore index on {table_full_name}.")
+        cursor.execute(f"CREATE CLUSTERED COLUMNSTORE INDEX [CCI_{target_table}] ON {table_full_name};")
     target_conn.commit()
     cursor.close()
 
-def insert_chunk(chunk, tgt_conn_str, target_schema, target_table, header):
+def target_table_exists(target_conn, target_schema, target_table):
+    """Return True if [schema].[table] exists in the target database."""
+    cursor = target_conn.cursor()
+    cursor.execute("SELECT OBJECT_ID(?, 'U')", (f"[{target_schema}].[{target_table}]",))
+    exists = cursor.fetchone()[0] is not None
+    cursor.close()
+    return exists
+
+def swap_in_shadow_table(target_conn, target_schema, target_table, shadow_table):
+    """
+    Replace the live target table with the fully loaded shadow table in one short transaction.
+    The live table is renamed away, the shadow table takes its name and the old data is dropped;
+    indexes and constraints named after the shadow table are renamed to match the live table.
+    Readers only ever see the complete old or the complete new table.
+    """
+    cursor = target_conn.cursor()
+    old_table = f"{target_table}__old"
+    live_full_name = f"[{target_schema}].[{target_table}]"
+    shadow_full_name = f"[{target_schema}].[{shadow_table}]"
+    old_full_name = f"[{target_schema}].[{old_table}]"
+    cursor.execute(
+        "SELECT i.name, i.is_primary_key FROM sys.indexes i WHERE i.object_id = OBJECT_ID(?) AND i.name LIKE ?",
+        (shadow_full_name, f"%{shadow_table}%"),
+    )
+    renames = [(row.name, row.name.replace(shadow_table, target_table), row.is_primary_key) for row in cursor.fetchall()]
+    started = time.perf_counter()
+    # All statements run in the connection's transaction (autocommit is off) and are committed together.
+    try:
+        cursor.execute("SET XACT_ABORT ON;")
+        cursor.execute(f"DROP TABLE IF EXISTS {old_full_name};")
+        cursor.execute("IF OBJECT_ID(?, 'U') IS NOT NULL EXEC sp_rename ?, ?;", (live_full_name, live_full_name, old_table))
+        cursor.execute("EXEC sp_rename ?, ?;", (shadow_full_name, target_table))
+        cursor.execute(f"DROP TABLE IF EXISTS {old_full_name};")
+        for old_name, new_name, is_primary_key in renames:
+            if is_primary_key:
+                # Primary key constraints are schema-scoped objects.
+                cursor.execute("EXEC sp_rename ?, ?, 'OBJECT';", (f"[{target_schema}].[{old_name}]", new_name))
+            else:
+                cursor.execute("EXEC sp_rename ?, ?, 'INDEX';", (f"{live_full_name}.[{old_name}]", new_name))
+        target_conn.commit()
+    except Exception:
+        target_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    logger.info(f"Swapped {shadow_full_name} in as {live_full_name} in {time.perf_counter() - started:.3f}s.")
+
+def delete_recids(target_conn, target_schema, target_table, recids, chunk_size):
+    """
+    Delete the rows with the given RECIDs from the target table.
+    The keys are bulk inserted into a temp table first so the delete is a single set-based statement.
+    """
+    if not recids:
+        return
+    cursor = target_conn.cursor()
+    table_full_name = f"[{target_schema}].[{target_table}]"
+    cursor.execute("CREATE TABLE #delete_recids (RECID NVARCHAR(450) NOT NULL PRIMARY KEY);")
+    cursor.fast_executemany = True
+    for i in range(0, len(recids), chunk_size):
+        cursor.executemany("INSERT INTO #delete_recids (RECID) VALUES (?)", [(r,) for r in recids[i:i + chunk_size]])
+    cursor.execute(
+        f"DELETE t FROM {table_full_name} t WHERE EXISTS "
+        f"(SELECT 1 FROM #delete_recids d WHERE d.RECID = t.[RECID]);"
+    )
+    logger.info(f"Deleted {cursor.rowcount} changed/removed rows from {table_full_name}.")
+    cursor.execute("DROP TABLE #delete_recids;")
+    target_conn.commit()
+    cursor.close()
+
+def insert_chunk(chunk, tgt_conn_str, target_schema, target_table, header, tablock=False):
     """
     Insert a chunk of rows into the target table.
     Each call opens its own connection.
+    With tablock the chunk is staged in a temp table and moved with a single
+    INSERT ... WITH (TABLOCK) SELECT, which is minimally logged for heaps and
+    columnstore tables (SIMPLE or BULK_LOGGED recovery model).
+    Errors are logged and re-raised so the caller knows the chunk was not loaded.
     """
     try:
         conn = get_connection(*tgt_conn_str)  # tgt_conn_str is a tuple: (server, database, username, password)
@@ -32,29 +150,81 @@ def insert_chunk(chunk, tgt_conn_str, target_schema, target_table, header):
         columns = ", ".join([f"[{col}]" for col in header])
         placeholders = ", ".join(["?" for _ in header])
         table_full_name = f"[{target_schema}].[{target_table}]"
-        insert_query = f"INSERT INTO {table_full_name} ({columns}) VALUES ({placeholders})"
         #Use fast_executemany
         cursor.fast_executemany = True
-        cursor.executemany(insert_query, chunk)
+        if tablock:
+            columns_def = ", ".join([f"[{col}] NVARCHAR(MAX)" for col in header])
+            cursor.execute(f"CREATE TABLE #stage ({columns_def});")
+            cursor.executemany(f"INSERT INTO #stage ({columns}) VALUES ({placeholders})", chunk)
+            cursor.execute(f"INSERT INTO {table_full_name} WITH (TABLOCK) ({columns}) SELECT {columns} FROM #stage;")
+            cursor.execute("DROP TABLE #stage;")
+        else:
+            insert_query = f"INSERT INTO {table_full_name} ({columns}) VALUES ({placeholders})"
+            cursor.executemany(insert_query, chunk)
         conn.commit()
         cursor.close()
         conn.close()
     except Exception as e:
         logger.error(f"Error inserting chunk: {e}")
+        raise
+
+def timed_insert_chunk(chunk, tgt_conn_str, target_schema, target_table, header, tablock=False):
+    """Run insert_chunk and return its duration in seconds."""
+    started = time.perf_counter()
+    insert_chunk(chunk, tgt_conn_str, target_schema, target_table, header, tablock)
+    return time.perf_counter() - started
 
-def load_data_to_target_multi(tgt_conn_str, target_schema, target_table, header, rows, n_threads, chunk_size):
+def load_data_to_target_multi(tgt_conn_str, target_schema, target_table, header, rows, n_threads, chunk_size,
+                              chunk_tuner=None, worker_tuner=None, tablock=False):
     """
-    Insert the processed rows into the target table using multiple threads.
-    Split rows into chunks of size chunk_size; each chunk is inserted concurrently.
+    Insert the processed rows (a processing.RowBatch) into the target table using multiple threads.
+    Split rows into chunks of size chunk_size; each chunk is inserted concurrently. Row tuples
+    are only built per chunk, just before the chunk is submitted.
+    chunk_tuner/worker_tuner (see tuning.StageTuner) adapt the chunk size and the number of
+    concurrent inserts while the load is running. tablock is passed on to insert_chunk.
+    All chunks are attempted; if any of them failed a RuntimeError is raised at the end.
     """
+    chunk_tuner = chunk_tuner or StageTuner("chunk_size", chunk_size)
+    worker_tuner = worker_tuner or StageTuner("insert_threads", n_threads)
     total_rows = len(rows)
-    n_chunks = ceil(total_rows / chunk_size)
-    chunks = [rows[i * chunk_size:(i + 1) * chunk_size] for i in range(n_chunks)]
-    logger.info(f"Inserting {total_rows} rows in {n_chunks} chunks using {n_threads} threads...")
-    with ThreadPoolExecutor(max_workers=n_threads) as executor:
-        futures = [executor.submit(insert_chunk, chunk, tgt_conn_str, target_schema, target_table, header) for chunk in chunks]
-        for future in as_completed(futures):
-            try:
-                future.result()
-            except Exception as e:
-                logger.error(f"Error in chunk insertion: {e}")
+    logger.info(f"Inserting {total_rows} rows in chunks of {chunk_tuner.value} using {worker_tuner.value} threads...")
+    offset = 0
+    loaded = 0
+    failed_chunks = 0
+    failed_rows = 0
+    pending = {}
+    started = last_progress = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=worker_tuner.maximum) as executor:
+        while offset < total_rows or pending:
+            # Keep at most insert_threads chunks in flight.
+            while offset < total_rows and len(pending) < worker_tuner.value:
+                chunk = rows.rows(offset, offset + chunk_tuner.value)
+                offset += len(chunk)
+                future = executor.submit(timed_insert_chunk, chunk, tgt_conn_str, target_schema, target_table, header, tablock)
+                pending[future] = len(chunk)
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                n_rows = pending.pop(future)
+                try:
+                    elapsed = future.result()
+                    chunk_tuner.record(n_rows, elapsed)
+                    worker_tuner.record(n_rows)
+                except Exception as e:
+                    logger.error(f"Error in chunk insertion: {e}")
+                    failed_chunks += 1
+                    failed_rows += n_rows
+                loaded += n_rows
+            now = time.perf_counter()
+            if now - last_progress >= PROGRESS_INTERVAL or loaded == total_rows:
+                last_progress = now
+                log_progress(target_table, loaded, total_rows, now - started)
+    if total_rows == 0:
+        log_progress(target_table, 0, 0, 0)
+    if failed_chunks:
+        raise RuntimeError(f"{failed_chunks} chunks ({failed_rows} rows) could not be inserted into "
+                           f"[{target_schema}].[{target_table}].")
+
+def log_progress(target_table, done, total, seconds):
+    """Log a progress line in a fixed format (parsed by the GUI progress view)."""
+    rate = done / seconds if seconds > 0 else 0.0
+    logger.info(f"Progress for target table '{target_table}': {done}/{total} rows ({rate:.0f} rows/sec)")
@@ -1,10 +1,21 @@
 # data_loader/main.py
+import os
 import argparse
-from .config import load_config, save_config
+import time
+from .config import load_config, get_bool_option
 from .database import get_connection
-from .extraction import get_view_definition, process_rows
-from .processing import parse_view_mapping_xml, parse_view_mapping_nonxml
-from .loader import create_target_table, load_data_to_target_multi
+from .extraction import get_view_definition, source_columns, process_rows, process_large_records
+from .processing import parse_view_mapping_xml, parse_view_mapping_nonxml, build_header
+from .spill import get_spill_buffer
+from .memory import get_memory_profiler
+from .change_detection import ChangeTracker
+from .tuning import build_tuners
+from .sinks import get_sink
+from .planning import plan
+from .reconcile import verify, reconcile_table
+from .state import open_state_store, default_owner, DEFAULT_LOCK_TIMEOUT
+from .worker import run_worker, DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS
+from .service import serve, DEFAULT_SERVE_HOST, DEFAULT_SERVE_PORT
 from .logging import logger
 from .conversion import convert_value
 
@@ -13,182 +24,377 @@ def main():
         description="Extract and migrate data for multiple tables based on config file."
     )
     parser.add_argument("--config", default="config/config.json", help="Path to configuration JSON file")
+    parser.add_argument("--plan", action="store_true",
+                        help="Dry run: estimate duration and memory per enabled table without loading anything")
+    parser.add_argument("--plan-sample-rows", type=int, default=1000,
+                        help="Number of rows sampled per table in --plan mode")
+    parser.add_argument("--verify", action="store_true",
+                        help="Reconcile source and target RECIDs of every enabled table without loading anything")
+    parser.add_argument("--worker", action="store_true",
+                        help="Claim tables from the shared work queue in the state store (run several workers to scale out)")
+    parser.add_argument("--batch", default=time.strftime("%Y%m%d"),
+                        help="Work queue batch the worker joins (default: today's date)")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run as a service: accept run requests over HTTP and poll change-detection tables")
+    parser.add_argument("--port", type=int, default=None,
+                        help=f"Port of the service HTTP endpoint (default: serve_port or {DEFAULT_SERVE_PORT})")
+    parser.add_argument("--poll-interval", type=int, default=None,
+                        help="Seconds between micro-batch runs of the change-detection tables in --serve mode (0 disables polling)")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="Trace memory use per table and stage (slows the run down; for diagnosis)")
+    parser.add_argument("--reset-watermark", action="append", metavar="TABLE",
+                        help="Forget the stored incremental watermark of a source or target table, so its next run "
+                             "starts from incremental_value again (can be repeated)")
     args = parser.parse_args()
 
     config = load_config()
-    source_conf = config["source"]
-    target_conf = config["target"]
+    if args.profile_memory:
+        config["default"]["profile_memory"] = True
+    if args.plan:
+        plan(config, args.plan_sample_rows)
+        return
+    if args.verify:
+        verify(config)
+        return
+
     default_conf = config["default"]
-    table_configs = config["tables"]
 
+    # Watermarks, run records and table locks live in the state store, not in config.json.
+    state = open_state_store(default_conf)
+    owner = default_owner()
+    lock_timeout = int(default_conf.get("lock_timeout", DEFAULT_LOCK_TIMEOUT))
+
+    if args.reset_watermark:
+        for name in args.reset_watermark:
+            tbl = next((t for t in config["tables"] if name in (t["table"], t["target_table"])), None)
+            target_table = tbl["target_table"] if tbl else name
+            if state.reset_watermark(target_table):
+                logger.info(f"Watermark of '{target_table}' reset; the next run starts from incremental_value.")
+            else:
+                logger.warning(f"No stored watermark found for '{name}'.")
+        state.close()
+        return
+
+    if args.serve:
+        port = args.port or int(default_conf.get("serve_port", DEFAULT_SERVE_PORT))
+        poll_interval = args.poll_interval if args.poll_interval is not None else int(default_conf.get("poll_interval", 0))
+        serve(state, run_table, owner, lock_timeout, default_conf, default_conf.get("serve_host") or DEFAULT_SERVE_HOST,
+              port, poll_interval)
+        state.close()
+        return
+
+    if args.worker:
+        lease_seconds = int(default_conf.get("lease_seconds", DEFAULT_LEASE_SECONDS))
+        max_attempts = int(default_conf.get("max_attempts", DEFAULT_MAX_ATTEMPTS))
+        run_summary = run_worker(config, state, run_table, args.batch, owner, lease_seconds, max_attempts)
+        log_run_summary(run_summary)
+        state.close()
+        return
+
+    # Per-table row counts and stage timings, logged at the end of the run.
+    run_summary = []
+    # Tables skipped because another run holds their lock.
+    skipped = []
+
+    for tbl in config["tables"]:
+        # Check if table is enabled for ETL
+        if not tbl.get("enabled", True):
+            logger.info(f"Skipping table '{tbl['table']}' as extraction is disabled in config")
+            continue
+        summary = run_table(config, tbl, state, owner, lock_timeout, skipped)
+        if summary is not None:
+            run_summary.append(summary)
+
+    log_run_summary(run_summary, skipped)
+    state.close()
+
+def log_run_summary(run_summary, skipped=()):
+    if run_summary or skipped:
+        logger.info("Run summary:")
+        for entry in run_summary:
+            verified = ""
+            if entry.get("verify") is not None:
+                result = entry["verify"]
+                verified = (", verified" if not result["mismatched_buckets"] else
+                            f", VERIFY FAILED ({len(result['missing'])} missing, {len(result['extra'])} extra)")
+            memory = ""
+            if entry.get("memory") is not None:
+                profile = entry["memory"]
+                memory = (f", peak RSS {profile['peak_rss'] / 1048576:.1f} MB, peak traced "
+                          f"{profile['peak_traced'] / 1048576:.1f} MB in {profile['peak_stage']}")
+            logger.info(f"  {entry['table']}: {entry['rows']} rows, extract+parse {entry['extract_seconds']:.1f}s, "
+                        f"load {entry['load_seconds']:.1f}s, post-load {entry['post_load_seconds']:.1f}s{verified}{memory}")
+        for entry in skipped:
+            logger.warning(f"  {entry['table']}: SKIPPED, target locked by {entry['locked_by']}")
+
+def run_table(config, tbl, state, owner, lock_timeout=DEFAULT_LOCK_TIMEOUT, skipped=None, release=True):
+    """
+    Process one table under its state-store lock and record the run.
+    The watermark is stored in the same transaction that marks the run successful, before the
+    lock is released. With release=False the lock is left to the caller (worker mode releases
+    it together with the work queue entry). Returns the table's summary dict, or None if it
+    was skipped or failed. Tables skipped because of another run's lock are added to skipped
+    as {"table", "locked_by"} if given.
+    """
+    target_table = tbl["target_table"]
+    if not state.acquire_lock(target_table, owner, lock_timeout):
+        locked_by = state.lock_owner(target_table)
+        logger.warning(f"Skipping table '{tbl['table']}': target '{target_table}' is locked by another run ({locked_by}).")
+        if skipped is not None:
+            skipped.append({"table": tbl["table"], "locked_by": locked_by})
+        return None
+    try:
+        run_id = state.start_run(target_table, owner)
+        try:
+            summary, watermark = process_table(config, tbl, state)
+        except Exception as e:
+            logger.error(f"Processing failed for table '{tbl['table']}': {e}")
+            state.finish_run(run_id, target_table, status="failed", message=str(e))
+            return None
+        state.finish_run(run_id, target_table, summary, watermark, status="success" if summary else "skipped")
+        return summary
+    finally:
+        if release:
+            state.release_lock(target_table, owner)
+
+def process_table(config, tbl, state):
+    """
+    Extract, parse and load one table.
+    Returns (summary, watermark): summary is a dict of row count and stage timings (None if the
+    table was skipped) and watermark a (incremental_column, value) pair to store, or None.
+    """
+    source_conf = config["source"]
+    default_conf = config["default"]
     batch_size = int(default_conf.get("batch_size", 1000))
     threads = int(default_conf.get("threads", 4))
-    oldconfig = config
 
-    # Build source and target connection parameters (as tuples)
+    # Build source connection parameters (as tuple)
     src_conn_params = (source_conf["server"], source_conf["database"], source_conf["username"], source_conf["password"])
-    tgt_conn_params = (target_conf["server"], target_conf["database"], target_conf["username"], target_conf["password"])
 
-    for tbl in table_configs:
-        logger.info(f"Processing source table '{tbl['table']}' with view '{tbl['view']}' to target table '{tbl['target_table']}'")
-        nonxml = tbl.get("nonxml", False)
-        enabled = tbl.get("enabled",True)
-        
-        incremental_col = tbl.get("incremental_column", "").strip()
-        # last_value = tbl.get("incremental_value", "").strip()
-        # Get the last incremental value from the config.
+    logger.info(f"Processing source table '{tbl['table']}' with view '{tbl['view']}' to target table '{tbl['target_table']}'")
+    nonxml = tbl.get("nonxml", False)
+    
+    incremental_alias = tbl.get("incremental_column", "").strip()
+    # Get the last incremental value from the state store; incremental_value in the config only seeds the first run.
+    last_value_str = state.get_watermark(tbl["target_table"], incremental_alias) if incremental_alias else None
+    if last_value_str is None:
         last_value_str = tbl.get("incremental_value", "").strip()
-        # Convert the stored last_value using our helper.
-        last_value_conv = convert_value(last_value_str) if last_value_str else None
-        
-        logger.info(f"Last incremental value for table '{tbl['target_table']}': {last_value_conv}")
-        
-        # Check if table is enabled for ETL
-        if not enabled:
-            logger.info(f"Skipping table '{tbl['table']}' as extraction is disabled in config")
-            continue
-        # Connect to source database and retrieve view definition and data
-        src_conn = get_connection(*src_conn_params)
-        mapping_cursor = src_conn.cursor()
-        view_def = get_view_definition(mapping_cursor, tbl["view"])
-        if view_def is None:
-            logger.error(f"View definition for {tbl['view']} not found. Skipping table {tbl['table']}.")
-            src_conn.close()
-            continue
+    # Convert the stored last_value using our helper.
+    last_value_conv = convert_value(last_value_str) if last_value_str else None
+    
+    logger.info(f"Last incremental value for table '{tbl['target_table']}': {last_value_conv}")
+    
+    # Connect to source database and retrieve view definition and data
+    src_conn = get_connection(*src_conn_params)
+    mapping_cursor = src_conn.cursor()
+    view_def = get_view_definition(mapping_cursor, tbl["view"])
+    if view_def is None:
+        logger.error(f"View definition for {tbl['view']} not found. Skipping table {tbl['table']}.")
+        src_conn.close()
+        return None, None
 
-        # Get mapping based on transformation type
-        if nonxml:
-            mapping = parse_view_mapping_nonxml(view_def)
-        else:
-            mapping = parse_view_mapping_xml(view_def)
+    # Get mapping based on transformation type
+    if nonxml:
+        mapping = parse_view_mapping_nonxml(view_def)
+    else:
+        mapping = parse_view_mapping_xml(view_def)
 
-        if not mapping:
-            logger.error("No mapping found. Skipping table.")
-            src_conn.close()
-            continue
+    if not mapping:
+        logger.error("No mapping found. Skipping table.")
+        src_conn.close()
+        return None, None
 
-        # logger.info("Mapping for output columns:")
-        # for m in mapping:
-            # logger.info(f"  {m}")
-            
-        src_cursor = src_conn.cursor()
-            
-        # Fully qualified source table name
-        source_table_full = f"[{source_conf['schema']}].[{tbl['table']}]"
+    # logger.info("Mapping for output columns:")
+    # for m in mapping:
+        # logger.info(f"  {m}")
         
-        # logger.info(f"Selecting from source table: {source_table_full}")
-        query = f"SELECT RECID, XMLRECORD FROM {source_table_full} WITH (NOLOCK) OPTION (MAXDOP 1)"
-        src_cursor.execute(query)        
-        # src_cursor.execute(f"SELECT RECID, XMLRECORD FROM {source_table_full}")
-        logger.info(f"Query executing for source table {source_table_full} using: {query}")
-        # Process rows from source
-        # logger.info(f"Processing rows from: {source_table_full}")
-        processed_rows = process_rows(src_cursor, batch_size, threads, nonxml)
+    # Per-table fetch/parse/insert settings; adapted at runtime when autotune is enabled.
+    tuners = build_tuners(default_conf, tbl)
+    # Destination for the rows: the target SQL Server table or compressed file exports.
+    try:
+        sink = get_sink(config, tbl, tuners)
+    except ValueError as e:
+        logger.error(f"{e} Skipping table {tbl['table']}.")
         src_conn.close()
+        return None, None
 
+    table_started = time.perf_counter()
+    src_cursor = src_conn.cursor()
         
-        # If the incremental column is specified in the configuration, map its alias to the actual XML tag.
-        incremental_col = None
-        if "incremental_column" in tbl and tbl["incremental_column"].strip():
-            incremental_alias = tbl["incremental_column"].strip()
-            # For XML processing, mapping is assumed to be a list of tuples (xml_tag, alias)
-            if not nonxml:
-                for tag, alias in mapping:
-                    if alias.lower() == incremental_alias.lower():
-                        incremental_col = tag
-                        break
-                if incremental_col is None:
-                    logger.error(f"Incremental column alias '{incremental_alias}' not found in view mapping for table '{tbl['table']}'.")
-            else:
-                # For non-XML processing, you might decide to use a specific field.
-                # For this example, we assume RECID is used as the incremental field.
-                incremental_col = "RECID"
-
-        # Filter the processed rows based on incremental value
-        filtered_rows = []
-        new_max_value_conv = last_value_conv  # Will store the new max value (converted)
-        new_max_value_raw = last_value_str     # Keep the raw value for config saving
-
-        for recid, record in processed_rows:
-            current_val_raw = None
-            if incremental_col and not nonxml:
-                current_val_raw = record.get(incremental_col)
-            elif incremental_col and nonxml:
-                current_val_raw = recid  # For non-XML, using RECID as the incremental value (adjust if needed)
-                
+    # Fully qualified source table name
+    source_table_full = f"[{source_conf['schema']}].[{tbl['table']}]"
+    
+    # logger.info(f"Selecting from source table: {source_table_full}")
+    # Only the columns (and, with server_projection, the XML elements) the mapping needs are fetched.
+    projection = get_bool_option(default_conf, tbl, "server_projection")
+    # XML records larger than large_record_bytes are left out here and streamed in chunks afterwards.
+    large_record_bytes = 0 if nonxml else int(tbl.get("large_record_bytes", default_conf.get("large_record_bytes", 0)) or 0)
+    where = f" WHERE ISNULL(DATALENGTH(XMLRECORD), 0) <= {large_record_bytes}" if large_record_bytes > 0 else ""
+    query = f"SELECT {source_columns(mapping, nonxml, projection)} FROM {source_table_full} WITH (NOLOCK){where} OPTION (MAXDOP 1)"
+    src_cursor.execute(query)        
+    # src_cursor.execute(f"SELECT RECID, XMLRECORD FROM {source_table_full}")
+    logger.info(f"Query executing for source table {source_table_full} using: {query}")
+    # If the incremental column is specified in the configuration, find the batch column of its alias.
+    incremental_index = None
+    if tbl.get("change_detection", False) and incremental_alias:
+        logger.warning(f"Change detection is enabled for table '{tbl['table']}'; incremental_column is ignored.")
+    elif incremental_alias:
+        # For XML processing, mapping is assumed to be a list of tuples (xml_tag, alias)
+        if not nonxml:
+            for i, (tag, alias) in enumerate(mapping, 1):
+                if alias.lower() == incremental_alias.lower():
+                    incremental_index = i
+                    break
+            if incremental_index is None:
+                logger.error(f"Incremental column alias '{incremental_alias}' not found in view mapping for table '{tbl['table']}'.")
+        else:
+            # For non-XML processing, you might decide to use a specific field.
+            # For this example, we assume RECID is used as the incremental field.
+            incremental_index = 0
+
+    # Filter the processed rows based on incremental value (in place, on the incremental column only)
+    new_max_value_conv = last_value_conv  # Will store the new max value (converted)
+    new_max_value_raw = last_value_str     # Keep the raw value for the state store
+
+    def filter_incremental(parsed):
+        nonlocal new_max_value_conv, new_max_value_raw
+        keep = []
+        for current_val_raw in parsed.column(incremental_index):
             # Convert the current value.
-            current_val_conv = convert_value(current_val_raw) if current_val_raw is not None else None
-            
-            # If incremental filtering is enabled and a current value is found, decide whether to include the row.
-            if incremental_col and current_val_conv:
+            current_val_conv = convert_value(current_val_raw) if current_val_raw else None
+            # If a current value is found, decide whether to include the row.
+            if current_val_conv:
                 # If last_value is provided, only include rows where current_val is greater.
                 if last_value_conv and current_val_conv < last_value_conv:
-                    continue  # Skip this row as it is not new.
+                    keep.append(False)  # Skip this row as it is not new.
+                    continue
                 # Update new_max_value if current_val is greater than the previous maximum.
                 if new_max_value_conv is None or current_val_conv >= new_max_value_conv:
                     new_max_value_conv = current_val_conv
-                    new_max_value_raw = current_val_raw  # Save the raw value to write to config.
+                    new_max_value_raw = current_val_raw  # Save the raw value for the state store.
             # Include the row for insertion.
-            filtered_rows.append((recid, record))
+            keep.append(True)
+        if not all(keep):
+            parsed.filter(keep)
 
-        logger.info(f"Total rows to insert after filtering: {len(filtered_rows)}")
+    # Optional spill buffer: parsed rows beyond spill_rows go to local segment files instead of memory.
+    spill = get_spill_buffer(default_conf, tbl, build_header(mapping, nonxml))
+    # Optional memory profile (profile_memory / --profile-memory): RSS and traced memory per stage.
+    profiler = get_memory_profiler(default_conf, tbl)
 
-        # Continue building the header and row values as before.
-        if nonxml:
-            header = ["RECID"] + [alias for (_, alias, _) in mapping]
-        else:
-            header = ["RECID"] + [alias for (_, alias) in mapping]
-        header.append("TotalRecords")
-        # logger.info(f"Final header: {header}")
-
-        rows_to_insert = []
-        for recid, record in filtered_rows:
-            row = [recid]
-            if nonxml:
-                fields_taf, fields_ext = record
-                for pos, _, func in mapping:
-                    index = pos - 1
-                    if func == "tafjfield":
-                        value = fields_taf[index] if index < len(fields_taf) else ""
-                    elif func == "extractValueJS":
-                        value = fields_ext[index] if index < len(fields_ext) else ""
-                    else:
-                        value = ""
-                    row.append(value)
-            else:
-                for xml_tag, _ in mapping:
-                    row.append(record.get(xml_tag, ""))
-            rows_to_insert.append(tuple(row))
-
-        total_records = len(rows_to_insert)
-        # Append the total_records value to each row as an extra column.
-        rows_to_insert = [row + (total_records,) for row in rows_to_insert]
-        logger.info(f"Total rows processed for table '{tbl['table']}': {total_records}")
-
-        # If incremental filtering is in use, update the configuration with the new maximum value.
-        if incremental_col:
-            if incremental_col and new_max_value_raw and (last_value_conv is None or new_max_value_conv > last_value_conv):
-                tbl["incremental_value"] = new_max_value_raw  # Save the raw string value to config.
-                # tbl["incremental_value"] = new_max_value
+    # Hash-based change detection: only new, changed and deleted RECIDs are loaded.
+    tracker = None
+    if tbl.get("change_detection", False):
+        # The index lives next to the state database and is checked against the state store's token.
+        tracker = ChangeTracker(tbl["target_table"], os.path.dirname(state.path), state)
+        if not tracker.initial and not sink.exists():
+            logger.info(f"No existing {sink.describe()} found; change index reset, performing a full load.")
+            tracker.reset()
+
+    # Process rows from source
+    # logger.info(f"Processing rows from: {source_table_full}")
+    try:
+        batch = process_rows(src_cursor, batch_size, threads, nonxml, mapping,
+                             row_filter=tracker.check if tracker else None,
+                             fetch_tuner=tuners["fetch_size"], parse_tuner=tuners["parse_threads"],
+                             batch_filter=filter_incremental if incremental_index is not None else None,
+                             results=spill)
+        if large_record_bytes > 0:
+            batch = process_large_records(src_conn, source_table_full, mapping, large_record_bytes,
+                                          int(default_conf.get("large_record_chunk_bytes", 1048576)), projection,
+                                          hash_filter=tracker.check_hash if tracker else None,
+                                          batch_filter=filter_incremental if incremental_index is not None else None,
+                                          results=batch)
+        src_conn.close()
+        if spill is not None:
+            spill.finish()
+        extract_seconds = time.perf_counter() - table_started
+        if profiler is not None:
+            profiler.mark("extract")
+
+        # If incremental filtering is in use, the new maximum value is stored in the state store once the table is loaded.
+        watermark = None
+        if incremental_index is not None:
+            if new_max_value_raw and (last_value_conv is None or new_max_value_conv > last_value_conv):
+                watermark = (incremental_alias, new_max_value_raw)  # Save the raw string value.
                 logger.info(f"Setting Incremental value for table '{tbl['table']}' to '{tbl['incremental_column']}': {new_max_value_raw}")
             else:
                 logger.info(f"No new incremental value found for table '{tbl['table']}'.")
-        
-        # Connect to target database, drop and create target table
-        tgt_conn = get_connection(*tgt_conn_params)
-        create_target_table(tgt_conn, target_conf["schema"], tbl["target_table"], header)
-        tgt_conn.close()
-
-        # Load data into target using multithreading bulk insert
-        logger.info(f"Loading data into target table '{tbl['target_table']}' started.")
-        load_data_to_target_multi(tgt_conn_params, target_conf["schema"], tbl["target_table"], header, rows_to_insert, threads, batch_size)
-        logger.info(f"Data load complete for target table '{tbl['target_table']}'.")
-        
-        
-    # Save the updated configuration back to file.
-    save_config(config)
-    if config != oldconfig:
-        logger.info("Configuration updated with new incremental values for incremental extraction.")
+
+        summary = load_table(tbl, batch, sink, tracker, tuners, extract_seconds, profiler)
+    finally:
+        if spill is not None:
+            spill.close()
+        if profiler is not None:
+            profiler.stop()
+        if tracker is not None:
+            tracker.close()
+    # Optional verification: compare source and target RECIDs with server-side checksums.
+    if get_bool_option(default_conf, tbl, "verify"):
+        try:
+            summary["verify"] = reconcile_table(config, tbl)
+        except Exception as e:
+            logger.error(f"Reconciliation failed for table '{tbl['table']}': {e}")
+    return summary, watermark
+
+def load_table(tbl, batch, sink, tracker, tuners, extract_seconds, profiler=None):
+    """
+    Load the parsed rows (RowBatch or SpillBuffer) of a table into its sink and return the table summary.
+    With a MemoryProfiler the load and post-load stages are marked and its profile added as "memory".
+    """
+    logger.info(f"Total rows to insert after filtering: {len(batch)}")
+
+    total_records = len(batch)
+    # Add the total_records value as an extra column (stored once, repeated when rows are written).
+    batch.add_constant("TotalRecords", total_records)
+    header = batch.header
+    logger.info(f"Total rows processed for table '{tbl['table']}': {total_records}")
+
+    load_started = time.perf_counter()
+    # Prepare the destination: full loads drop and recreate the target table (or replace the export files).
+    # Delta loads keep the existing data and only remove the RECIDs about to be (re)written or deleted.
+    if tracker is None or tracker.initial:
+        sink.begin(header, replace=True)
+    else:
+        sink.begin(header, replace=False)
+        deleted_recids = tracker.deleted_recids()
+        logger.info(f"Change detection for table '{tbl['table']}': {tracker.inserted} new, "
+                    f"{len(tracker.changed_recids)} changed, {len(deleted_recids)} deleted, {tracker.unchanged} unchanged rows.")
+        # New RECIDs are removed too: an earlier delta load that failed part way may have inserted some of
+        # them without committing the index, and inserting them again would duplicate those rows.
+        sink.delete(tracker.new_recids + tracker.changed_recids + deleted_recids)
+
+    # Load data into the destination using multiple threads
+    logger.info(f"Loading data into {sink.describe()} started.")
+    sink.write(batch)
+    sink.finish()
+    load_seconds = time.perf_counter() - load_started
+    logger.info(f"Data load complete for {sink.describe()}.")
+    if profiler is not None:
+        profiler.mark("load")
+
+    # Post-load stage: indexes and statistics are built after the data is in place.
+    post_load_timings = sink.post_load()
+    # Make the new data visible (swaps the shadow table in for reload_mode "swap").
+    sink.publish()
+    if profiler is not None:
+        profiler.mark("post_load")
+    summary = {
+        "table": tbl["table"],
+        "rows": total_records,
+        "extract_seconds": extract_seconds,
+        "load_seconds": load_seconds,
+        "post_load_seconds": sum(seconds for _, seconds in post_load_timings),
+    }
+    if profiler is not None:
+        summary["memory"] = profiler.finish()
+    if any(t.adaptive for t in tuners.values()):
+        logger.info(f"Auto-tuned settings for table '{tbl['table']}' (can be saved as table options): "
+                    + ", ".join(t.describe() for t in tuners.values()))
+    # Only reached when every chunk was loaded (a failed load raises), so no row is recorded as loaded by mistake.
+    if tracker is not None:
+        tracker.commit()
+    return summary
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,123 @@
+# data_loader/memory.py
+import os
+import sys
+import tracemalloc
+from .config import get_bool_option
+from .logging import logger
+
+try:
+    import psutil
+except ImportError:  # optional; a platform specific fallback is used without it
+    psutil = None
+
+# Frames kept per traced allocation (more frames give better sites but cost more memory).
+TRACEMALLOC_FRAMES = 1
+# Number of allocation sites reported per table.
+MEMORY_TOP_SITES = 5
+
+def get_rss():
+    """Return the resident set size of this process in bytes (0 if it cannot be determined)."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+        return 0
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+class MemoryProfiler:
+    """
+    Opt-in memory instrumentation of one table run.
+
+    tracemalloc runs from start() to finish(); mark(stage) records at every stage
+    boundary the RSS, the traced memory still held and the traced peak reached during
+    the stage. finish() adds the largest allocation sites at the stage boundary that
+    held the most memory and returns everything as a dict for the run summary.
+    Tracing slows parsing down noticeably, so this is meant for diagnosis runs only.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = []
+        self.baseline_rss = 0
+        self._started_tracing = False
+        self._snapshot = None
+        self._snapshot_stage = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracing = True
+        tracemalloc.clear_traces()
+        self._reset_peak()
+        self.baseline_rss = get_rss()
+
+    def _reset_peak(self):
+        # tracemalloc.reset_peak() is only available from Python 3.9.
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+    def mark(self, stage):
+        """Record the memory use at the end of a stage."""
+        current, peak = tracemalloc.get_traced_memory()
+        rss = get_rss()
+        self.stages.append({"stage": stage, "rss": rss, "traced": current, "traced_peak": peak})
+        if all(current >= s["traced"] for s in self.stages):
+            self._snapshot = tracemalloc.take_snapshot()
+            self._snapshot_stage = stage
+        logger.info(f"Memory after stage '{stage}' of table '{self.name}': RSS {rss / 1048576:.1f} MB, "
+                    f"held {current / 1048576:.1f} MB, stage peak {peak / 1048576:.1f} MB.")
+        self._reset_peak()
+
+    def stop(self):
+        """Stop tracing (if this profiler started it); safe to call more than once."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def finish(self):
+        """Stop tracing and return the memory summary of the table."""
+        self.stop()
+        top_sites = []
+        if self._snapshot is not None:
+            snapshot = self._snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                                   tracemalloc.Filter(False, __file__)])
+            top_sites = [(str(stat.traceback[0]), stat.size, stat.count)
+                         for stat in snapshot.statistics("lineno")[:MEMORY_TOP_SITES]]
+            self._snapshot = None
+        for site, size, count in top_sites:
+            logger.info(f"Largest allocation site of table '{self.name}' after stage '{self._snapshot_stage}': "
+                        f"{site}: {size / 1048576:.1f} MB in {count} blocks")
+        return {
+            "baseline_rss": self.baseline_rss,
+            "stages": self.stages,
+            "peak_rss": max([s["rss"] for s in self.stages] + [self.baseline_rss]),
+            "peak_traced": max([s["traced_peak"] for s in self.stages] + [0]),
+            "peak_stage": max(self.stages, key=lambda s: s["traced_peak"])["stage"] if self.stages else None,
+            "top_sites": top_sites,
+        }
+
+def get_memory_profiler(default_conf, tbl):
+    """Return a started MemoryProfiler if profile_memory is set (per table or in default), otherwise None."""
+    if not get_bool_option(default_conf, tbl, "profile_memory"):
+        return None
+    profiler = MemoryProfiler(tbl["table"])
+    profiler.start()
+    return profiler
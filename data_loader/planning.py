@@ -0,0 +1,216 @@
+# data_loader/planning.py
+import math
+import time
+import tracemalloc
+from .config import get_bool_option
+from .database import get_connection
+from .extraction import get_view_definition, source_columns, parse_batch
+from .processing import parse_view_mapping_xml, parse_view_mapping_nonxml
+from .tuning import build_tuners
+from .logging import logger
+
+# Target number of bytes per fetch / insert chunk used for the suggested batch sizes.
+FETCH_BYTES_TARGET = 4 * 1024 * 1024
+CHUNK_BYTES_TARGET = 2 * 1024 * 1024
+
+def get_table_size(cursor, table_full_name):
+    """
+    Return (row_count, data_bytes) of a table from sys.partitions / sys.allocation_units.
+    Only the heap or clustered index (index_id 0/1) is counted, including LOB and row-overflow pages.
+    """
+    query = """
+    SELECT
+        (SELECT SUM(p.rows) FROM sys.partitions p
+          WHERE p.object_id = OBJECT_ID(?) AND p.index_id IN (0, 1)) AS row_count,
+        (SELECT SUM(a.total_pages) * 8192 FROM sys.partitions p
+           JOIN sys.allocation_units a
+             ON a.container_id = CASE WHEN a.type IN (1, 3) THEN p.hobt_id ELSE p.partition_id END
+          WHERE p.object_id = OBJECT_ID(?) AND p.index_id IN (0, 1)) AS data_bytes
+    """
+    cursor.execute(query, (table_full_name, table_full_name))
+    row = cursor.fetchone()
+    return int(row.row_count or 0), int(row.data_bytes or 0)
+
+def fetch_sample(cursor, table_full_name, row_count, sample_rows, columns="RECID, XMLRECORD"):
+    """
+    Fetch about sample_rows rows with TABLESAMPLE. Small tables (or an empty sample) fall back to TOP.
+    columns is the select list of the real source query (see extraction.source_columns).
+    Returns (rows, seconds) where rows is a list of (RECID, XMLRECORD).
+    """
+    started = time.perf_counter()
+    rows = []
+    if row_count > sample_rows:
+        # TABLESAMPLE works on pages, so ask for twice the fraction and cut with TOP.
+        percent = min(100.0, max(0.001, sample_rows * 200.0 / row_count))
+        cursor.execute(
+            f"SELECT TOP ({int(sample_rows)}) {columns} FROM {table_full_name} "
+            f"TABLESAMPLE ({percent:.3f} PERCENT) WITH (NOLOCK)"
+        )
+        rows = [(r.RECID, r.XMLRECORD) for r in cursor.fetchall()]
+    if not rows:
+        cursor.execute(f"SELECT TOP ({int(sample_rows)}) {columns} FROM {table_full_name} WITH (NOLOCK)")
+        rows = [(r.RECID, r.XMLRECORD) for r in cursor.fetchall()]
+    return rows, time.perf_counter() - started
+
+def measure_insert_rate(tgt_conn_params, header, rows):
+    """Insert the sample rows into a temp table on the target and return the insert rate (rows/sec, one thread)."""
+    conn = get_connection(*tgt_conn_params)
+    try:
+        cursor = conn.cursor()
+        columns_def = ", ".join([f"[{col}] NVARCHAR(MAX)" for col in header])
+        cursor.execute(f"CREATE TABLE #plan_probe ({columns_def});")
+        placeholders = ", ".join(["?" for _ in header])
+        cursor.fast_executemany = True
+        started = time.perf_counter()
+        cursor.executemany(f"INSERT INTO #plan_probe VALUES ({placeholders})", rows)
+        conn.commit()
+        elapsed = time.perf_counter() - started
+        cursor.execute("DROP TABLE #plan_probe;")
+        cursor.close()
+    finally:
+        conn.close()
+    return len(rows) / elapsed if elapsed > 0 else 0.0
+
+def plan_table(config, tbl, sample_rows):
+    """Measure one table and return a dict with its size, measured rates and estimates (or None if skipped)."""
+    source_conf = config["source"]
+    target_conf = config["target"]
+    src_conn_params = (source_conf["server"], source_conf["database"], source_conf["username"], source_conf["password"])
+    tgt_conn_params = (target_conf["server"], target_conf["database"], target_conf["username"], target_conf["password"])
+    nonxml = tbl.get("nonxml", False)
+    default_conf = config["default"]
+    tuners = build_tuners(default_conf, tbl)
+    source_table_full = f"[{source_conf['schema']}].[{tbl['table']}]"
+
+    src_conn = get_connection(*src_conn_params)
+    try:
+        cursor = src_conn.cursor()
+        view_def = get_view_definition(cursor, tbl["view"])
+        if view_def is None:
+            logger.error(f"View definition for {tbl['view']} not found. Skipping table {tbl['table']}.")
+            return None
+        mapping = parse_view_mapping_nonxml(view_def) if nonxml else parse_view_mapping_xml(view_def)
+        if not mapping:
+            logger.error(f"No mapping found. Skipping table {tbl['table']}.")
+            return None
+        row_count, data_bytes = get_table_size(cursor, source_table_full)
+        projection = get_bool_option(default_conf, tbl, "server_projection")
+        columns = source_columns(mapping, nonxml, projection)
+        sample, fetch_seconds = fetch_sample(cursor, source_table_full, row_count, sample_rows, columns)
+    finally:
+        src_conn.close()
+
+    table_plan = {
+        "table": tbl["table"],
+        "target_table": tbl["target_table"],
+        "rows": row_count,
+        "data_bytes": data_bytes,
+        "sample_rows": len(sample),
+    }
+    if not sample:
+        table_plan.update(avg_record_bytes=0, fetch_seconds=0.0, parse_seconds=0.0, load_seconds=0.0,
+                    total_seconds=0.0, memory_bytes=0, fetch_size=tuners["fetch_size"].value,
+                    chunk_size=tuners["chunk_size"].value, threads=tuners["insert_threads"].value)
+        return table_plan
+
+    # XMLRECORD is NVARCHAR, i.e. two bytes per character on the wire.
+    sample_bytes = sum(2 * len(x or "") for _, x in sample)
+    avg_record_bytes = sample_bytes / len(sample)
+
+    # Parse the sample through the real parse path, then once more under tracemalloc
+    # to measure the memory held by the parsed batch.
+    started = time.perf_counter()
+    batch = parse_batch(sample, nonxml, mapping)
+    parse_seconds = time.perf_counter() - started
+    del batch
+    tracemalloc.start()
+    batch = parse_batch(sample, nonxml, mapping)
+    row_memory = tracemalloc.get_traced_memory()[0] / len(batch)
+    tracemalloc.stop()
+    parse_rate = len(batch) / parse_seconds if parse_seconds > 0 else float("inf")
+
+    batch.add_constant("TotalRecords", 0)
+    header = batch.header
+    rows = batch.rows()
+    try:
+        insert_rate = measure_insert_rate(tgt_conn_params, header, rows)
+    except Exception as e:
+        logger.error(f"Could not measure insert rate on the target for table '{tbl['table']}': {e}")
+        insert_rate = 0.0
+
+    threads = tuners["insert_threads"].value
+    est_fetch = row_count / (len(sample) / fetch_seconds) if fetch_seconds > 0 else 0.0
+    # Parsing is largely GIL bound, so the single-thread rate is used.
+    est_parse = row_count / parse_rate
+    est_load = row_count / (insert_rate * threads) if insert_rate > 0 else 0.0
+    avg_row_bytes = sum(sum(len(str(v)) for v in row) for row in rows) * 2 / len(rows)
+    # Suggest enough concurrent inserts for the load to keep pace with fetch + parse
+    # (single-thread insert rate measured above), within min_threads..max_threads.
+    suggested_threads = threads
+    if insert_rate > 0 and est_fetch + est_parse > 0:
+        upstream_rate = row_count / (est_fetch + est_parse)
+        suggested_threads = min(max(math.ceil(upstream_rate / insert_rate), int(default_conf.get("min_threads", 1) or 1)),
+                                int(default_conf.get("max_threads", 16) or 16))
+
+    table_plan.update(
+        avg_record_bytes=avg_record_bytes,
+        fetch_seconds=est_fetch,
+        parse_seconds=est_parse,
+        load_seconds=est_load,
+        total_seconds=est_fetch + est_parse + est_load,
+        # The parsed batch of the whole table is held in memory before loading.
+        memory_bytes=row_count * row_memory,
+        fetch_size=int(min(50000, max(100, FETCH_BYTES_TARGET / max(avg_record_bytes, 1)))),
+        chunk_size=int(min(50000, max(100, CHUNK_BYTES_TARGET / max(avg_row_bytes, 1)))),
+        threads=suggested_threads,
+    )
+    return table_plan
+
+def format_bytes(n):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if n < 1024:
+            return f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+def format_seconds(s):
+    s = int(s)
+    return f"{s // 3600:d}:{s // 60 % 60:02d}:{s % 60:02d}"
+
+def plan(config, sample_rows=1000):
+    """
+    Dry run: measure every enabled table and log estimated duration and memory use per table,
+    a suggested execution order (longest first) and suggested fetch/chunk/thread settings.
+    Nothing is written to the target tables.
+    """
+    plans = []
+    for tbl in config["tables"]:
+        if not tbl.get("enabled", True):
+            continue
+        logger.info(f"Planning table '{tbl['table']}' (view '{tbl['view']}')...")
+        try:
+            table_plan = plan_table(config, tbl, sample_rows)
+        except Exception as e:
+            logger.error(f"Planning failed for table '{tbl['table']}': {e}")
+            continue
+        if table_plan is None:
+            continue
+        plans.append(table_plan)
+        logger.info(
+            f"  {table_plan['table']}: {table_plan['rows']} rows, {format_bytes(table_plan['data_bytes'])} on disk, "
+            f"avg XMLRECORD {format_bytes(table_plan['avg_record_bytes'])} (sample {table_plan['sample_rows']} rows); "
+            f"estimated fetch {format_seconds(table_plan['fetch_seconds'])}, parse {format_seconds(table_plan['parse_seconds'])}, "
+            f"load {format_seconds(table_plan['load_seconds'])}, total {format_seconds(table_plan['total_seconds'])}, "
+            f"memory {format_bytes(table_plan['memory_bytes'])}"
+        )
+
+    plans.sort(key=lambda p: p["total_seconds"], reverse=True)
+    total = sum(p["total_seconds"] for p in plans)
+    logger.info(f"Suggested execution order (longest first), estimated total {format_seconds(total)}:")
+    for n, p in enumerate(plans, 1):
+        logger.info(
+            f"  {n}. {p['table']} -> {p['target_table']}: {format_seconds(p['total_seconds'])}, "
+            f"peak memory {format_bytes(p['memory_bytes'])}; suggested fetch_size={p['fetch_size']}, "
+            f"chunk_size={p['chunk_size']}, insert_threads={p['threads']}"
+        )
+    return plans
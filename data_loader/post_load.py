@@ -0,0 +1,128 @@
+# data_loader/post_load.py
+import re
+import time
+from .config import get_bool_option
+from .logging import logger
+
+def get_index_options(tbl):
+    """
+    Return the post-load index options of a table (the "indexes" entry), or None if there are none.
+
+    Example:
+      "indexes": {
+          "primary_key": true,            # clustered primary key on RECID (nonclustered for columnstore tables)
+          "secondary": [["CUSTOMER"], {"columns": ["CATEGORY", "CURRENCY"], "include": ["AMOUNT"]}],
+          "key_length": 450,              # NVARCHAR length of the key columns
+          "online": false,                # ONLINE = ON (Enterprise edition)
+          "maxdop": 0,
+          "update_statistics": true,
+          "statistics_fullscan": false
+      }
+    """
+    options = tbl.get("indexes")
+    if not options:
+        return None
+    secondary = []
+    for index in options.get("secondary", []):
+        if isinstance(index, dict):
+            secondary.append((list(index.get("columns", [])), list(index.get("include", []))))
+        else:
+            secondary.append((list(index), []))
+    return {
+        "primary_key": get_bool_option({}, options, "primary_key", True),
+        "secondary": [(columns, include) for columns, include in secondary if columns],
+        "key_length": int(options.get("key_length", 450)),
+        "online": get_bool_option({}, options, "online", False),
+        "maxdop": int(options.get("maxdop", 0)),
+        "update_statistics": get_bool_option({}, options, "update_statistics", True),
+        "statistics_fullscan": get_bool_option({}, options, "statistics_fullscan", False),
+    }
+
+def key_column_types(options):
+    """
+    Return {column: type} for the index key columns, which are created as NVARCHAR(key_length)
+    instead of NVARCHAR(MAX) (MAX columns cannot be index keys). Empty without index options.
+    """
+    if not options:
+        return {}
+    types = {}
+    for columns, _ in options["secondary"]:
+        for col in columns:
+            types[col] = f"NVARCHAR({options['key_length']}) NULL"
+    if options["primary_key"]:
+        types["RECID"] = f"NVARCHAR({options['key_length']}) NOT NULL"
+    return types
+
+def index_name(prefix, target_table, columns):
+    """Build an index/constraint name from the table and column names."""
+    return re.sub(r"[^A-Za-z0-9_]", "_", f"{prefix}_{target_table}_{'_'.join(columns)}")[:128]
+
+def index_exists(cursor, table_full_name, name):
+    cursor.execute("SELECT 1 FROM sys.indexes WHERE object_id = OBJECT_ID(?) AND name = ?", (table_full_name, name))
+    return cursor.fetchone() is not None
+
+def max_columns(cursor, table_full_name):
+    """Return the names of the NVARCHAR(MAX) columns of a table."""
+    cursor.execute("SELECT name FROM sys.columns WHERE object_id = OBJECT_ID(?) AND max_length = -1", (table_full_name,))
+    return {row.name for row in cursor.fetchall()}
+
+def build_indexes(target_conn, target_schema, target_table, options, columnstore=False):
+    """
+    Build the configured primary key and secondary indexes on a loaded target table,
+    then update statistics. Indexes that already exist (delta loads) are skipped.
+    Key columns are created as NVARCHAR(key_length) (see key_column_types); only tables
+    created before an index was configured still have NVARCHAR(MAX) key columns, which
+    are converted first. Returns a list of (step, seconds) timings.
+    """
+    cursor = target_conn.cursor()
+    table_full_name = f"[{target_schema}].[{target_table}]"
+    key_types = key_column_types(options)
+    unconverted = max_columns(cursor, table_full_name) & set(key_types)
+    with_options = f"ONLINE = {'ON' if options['online'] else 'OFF'}, MAXDOP = {options['maxdop']}"
+    timings = []
+
+    def run(step, statements):
+        started = time.perf_counter()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+            target_conn.commit()
+        except Exception as e:
+            target_conn.rollback()
+            logger.error(f"Post-load step '{step}' failed for {table_full_name}: {e}")
+        elapsed = time.perf_counter() - started
+        timings.append((step, elapsed))
+        logger.info(f"Post-load step '{step}' on {table_full_name} took {elapsed:.1f}s.")
+
+    if options["primary_key"]:
+        name = f"PK_{target_table}"
+        if not index_exists(cursor, table_full_name, name):
+            kind = "NONCLUSTERED" if columnstore else "CLUSTERED"
+            statements = []
+            if "RECID" in unconverted:
+                statements.append(f"ALTER TABLE {table_full_name} ALTER COLUMN [RECID] {key_types['RECID']};")
+            statements.append(
+                f"ALTER TABLE {table_full_name} ADD CONSTRAINT [{name}] PRIMARY KEY {kind} ([RECID]) WITH ({with_options});"
+            )
+            run(f"{kind.lower()} primary key", statements)
+
+    for columns, include in options["secondary"]:
+        name = index_name("IX", target_table, columns)
+        if index_exists(cursor, table_full_name, name):
+            continue
+        statements = [f"ALTER TABLE {table_full_name} ALTER COLUMN [{col}] {key_types[col]};"
+                      for col in columns if col in unconverted]
+        unconverted -= set(columns)
+        include_clause = f" INCLUDE ({', '.join(f'[{col}]' for col in include)})" if include else ""
+        statements.append(
+            f"CREATE NONCLUSTERED INDEX [{name}] ON {table_full_name} ({', '.join(f'[{col}]' for col in columns)})"
+            f"{include_clause} WITH ({with_options});"
+        )
+        run(f"index {name}", statements)
+
+    if options["update_statistics"]:
+        scan = " WITH FULLSCAN" if options["statistics_fullscan"] else ""
+        run("update statistics", [f"UPDATE STATISTICS {table_full_name}{scan};"])
+
+    cursor.close()
+    return timings
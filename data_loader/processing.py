@@ -1,6 +1,7 @@
 # data_loader/processing.py
 import re
 import xml.etree.ElementTree as ET
+from itertools import compress, repeat
 from .config import load_config
 from .logging import logger
 # from .config import  # (if you want to import constants from config.py, e.g., delimiters)
@@ -84,3 +85,163 @@ def parse_delimited_record(recid, recid_str, xmlrecord_str):
     fields_taf = recid_str.split(NONXML_TAF_DELIMITER)
     fields_ext = xmlrecord_str.split(NONXML_EXT_DELIMITER)
     return recid, (fields_taf, fields_ext)
+
+def build_header(mapping, nonxml):
+    """Return the output column names for a mapping: RECID followed by the view aliases."""
+    if nonxml:
+        return ["RECID"] + [alias for (_, alias, _) in mapping]
+    return ["RECID"] + [alias for (_, alias) in mapping]
+
+class RowBatch:
+    """
+    Columnar batch of output rows: one list of values per column, RECID first.
+
+    Parsers append straight into the column lists, filters compact them in place and
+    rows are only built as tuples when a chunk is handed to a writer (rows()/iter_rows()).
+    Columns holding the same value in every row (TotalRecords) are stored once.
+    """
+
+    __slots__ = ("names", "columns", "constants")
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.columns = [[] for _ in self.names]
+        self.constants = []
+
+    @property
+    def header(self):
+        return self.names + [name for name, _ in self.constants]
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    def column(self, index):
+        return self.columns[index]
+
+    def add_constant(self, name, value):
+        """Add a column with the same value in every row."""
+        self.constants.append((name, value))
+
+    def extend(self, other):
+        """Append the rows of another batch with the same columns."""
+        for column, other_column in zip(self.columns, other.columns):
+            column.extend(other_column)
+
+    def filter(self, keep):
+        """Keep only the rows whose flag in keep is true (in place)."""
+        for column in self.columns:
+            column[:] = compress(column, keep)
+
+    def iter_rows(self, start=0, stop=None):
+        """Iterate over rows start..stop as tuples."""
+        stop = len(self) if stop is None else stop
+        return zip(*[column[start:stop] for column in self.columns], *[repeat(value) for _, value in self.constants])
+
+    def rows(self, start=0, stop=None):
+        """Return rows start..stop as a list of tuples (e.g. one insert chunk for executemany)."""
+        return list(self.iter_rows(start, stop))
+
+def parse_xml_batch(records, mapping):
+    """
+    Parse (RECID, XMLRECORD) pairs straight into a RowBatch with the mapped columns.
+    Like parse_extracted_xml_record, repeated elements are concatenated with MULTI_VALUE_DELIMITER,
+    missing elements are empty and a record that fails to parse keeps only its RECID.
+    """
+    batch = RowBatch(build_header(mapping, False))
+    columns = batch.columns
+    recid_column = columns[0]
+    value_columns = columns[1:]
+    tag_columns = {}
+    for (tag, _), column in zip(mapping, value_columns):
+        tag_columns.setdefault(tag, []).append(column)
+    for recid, xml_record in records:
+        n = len(recid_column)
+        recid_column.append(recid)
+        try:
+            root = ET.fromstring(xml_record)
+            for child in root:
+                targets = tag_columns.get(child.tag)
+                if targets is None:
+                    continue
+                value = child.text if child.text is not None else ""
+                for column in targets:
+                    if len(column) > n:
+                        column[n] = column[n] + MULTI_VALUE_DELIMITER + value
+                    else:
+                        column.append(value)
+        except ET.ParseError as e:
+            logger.error(f"Error parsing XML for RECID {recid}: {e}")
+            for column in value_columns:
+                del column[n:]
+        except Exception as e:
+            logger.error(f"Unexpected error for RECID {recid}: {e}")
+            for column in value_columns:
+                del column[n:]
+        for column in value_columns:
+            if len(column) == n:
+                column.append("")
+    return batch
+
+def parse_xml_stream(recid, chunks, mapping):
+    """
+    Parse one XML record given as an iterable of text chunks into a one-row RowBatch.
+    XMLPullParser reads the chunks incrementally and every top-level element is dropped
+    once its value is taken, so memory does not grow with the size of the record.
+    If the record fails to parse the remaining chunks are still consumed.
+    """
+    batch = RowBatch(build_header(mapping, False))
+    wanted = {tag for tag, _ in mapping}
+    values = {}
+    chunks = iter(chunks)
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root = None
+    depth = 0
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                if event == "start":
+                    root = element if root is None else root
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth == 1:
+                    if element.tag in wanted:
+                        value = element.text if element.text is not None else ""
+                        values[element.tag] = values[element.tag] + MULTI_VALUE_DELIMITER + value if element.tag in values else value
+                    root.clear()
+        parser.close()
+    except ET.ParseError as e:
+        logger.error(f"Error parsing XML for RECID {recid}: {e}")
+        values = {}
+        for _ in chunks:
+            pass
+    except Exception as e:
+        logger.error(f"Unexpected error for RECID {recid}: {e}")
+        values = {}
+        for _ in chunks:
+            pass
+    batch.columns[0].append(recid)
+    for (tag, _), column in zip(mapping, batch.columns[1:]):
+        column.append(values.get(tag, ""))
+    return batch
+
+def parse_delimited_batch(records, mapping):
+    """
+    Parse non-XML (RECID, XMLRECORD) pairs into a RowBatch. tafjfield columns take the
+    n-th field of RECID, extractValueJS columns the n-th field of XMLRECORD (empty if missing).
+    """
+    batch = RowBatch(build_header(mapping, True))
+    recid_column = batch.columns[0]
+    fields = [(pos - 1, func, column) for (pos, _, func), column in zip(mapping, batch.columns[1:])]
+    for recid, xmlrecord in records:
+        _, (fields_taf, fields_ext) = parse_delimited_record(recid, recid, xmlrecord)
+        recid_column.append(recid)
+        for index, func, column in fields:
+            if func == "tafjfield":
+                column.append(fields_taf[index] if index < len(fields_taf) else "")
+            elif func == "extractValueJS":
+                column.append(fields_ext[index] if index < len(fields_ext) else "")
+            else:
+                column.append("")
+    return batch
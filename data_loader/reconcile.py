@@ -0,0 +1,154 @@
+# data_loader/reconcile.py
+import time
+from collections import Counter
+from .database import get_connection
+from .logging import logger
+
+# Buckets per drill-down level.
+RECONCILE_BUCKETS = 64
+# Buckets with at most this many rows are compared RECID by RECID instead of drilled into further.
+RECONCILE_DRILL_ROWS = 5000
+# Mismatched buckets followed per level; beyond that only counts are reported.
+RECONCILE_MAX_DRILL_BUCKETS = 256
+# Number of missing/extra RECIDs listed in the log.
+RECONCILE_LOG_RECIDS = 20
+
+# RECID hash shared by source and target; the cast makes it independent of the RECID column type.
+RECID_CHECKSUM = "BINARY_CHECKSUM(CAST(RECID AS NVARCHAR(MAX)))"
+
+def bucket_aggregates(cursor, table_full_name, modulus, parents=None, parent_modulus=None):
+    """
+    Return {bucket: (row_count, checksum)} for the RECIDs of a table, bucketed by hash % modulus.
+    With parents only the rows whose hash % parent_modulus is in parents are aggregated.
+    """
+    where = ""
+    if parents:
+        where = f" WHERE h % {parent_modulus} IN ({', '.join(str(int(b)) for b in parents)})"
+    cursor.execute(
+        f"SELECT h % {modulus} AS bucket, COUNT_BIG(*) AS row_count, CHECKSUM_AGG(c) AS checksum "
+        f"FROM (SELECT c, ABS(CAST(c AS BIGINT)) AS h FROM "
+        f"(SELECT {RECID_CHECKSUM} AS c FROM {table_full_name} WITH (NOLOCK)) a) b{where} "
+        f"GROUP BY h % {modulus}"
+    )
+    return {row.bucket: (row.row_count, row.checksum) for row in cursor.fetchall()}
+
+def bucket_recids(cursor, table_full_name, modulus, buckets):
+    """Return a Counter of the RECIDs in the given buckets."""
+    cursor.execute(
+        f"SELECT RECID FROM (SELECT RECID, ABS(CAST({RECID_CHECKSUM} AS BIGINT)) AS h "
+        f"FROM {table_full_name} WITH (NOLOCK)) a WHERE h % {modulus} IN ({', '.join(str(int(b)) for b in buckets)})"
+    )
+    return Counter(row.RECID for row in cursor.fetchall())
+
+def reconcile(src_conn, source_table_full, tgt_conn, target_table_full, buckets=RECONCILE_BUCKETS,
+              drill_rows=RECONCILE_DRILL_ROWS):
+    """
+    Compare the RECIDs of a source and a target table using server-side aggregates.
+
+    Both sides are grouped into buckets by a RECID hash and each bucket's row count and
+    CHECKSUM_AGG are compared. Only mismatched buckets are split further (the next level
+    groups by hash % buckets^(level+1)); once a mismatched bucket holds at most drill_rows
+    rows its RECIDs are fetched from both sides and diffed. Returns a dict with row counts,
+    the number of mismatched top-level buckets and the missing/extra RECIDs (target rows
+    duplicated are reported as extra). "complete" is False if the drill-down was cut short.
+    """
+    src_cursor = src_conn.cursor()
+    tgt_cursor = tgt_conn.cursor()
+    modulus = buckets
+    source = bucket_aggregates(src_cursor, source_table_full, modulus)
+    target = bucket_aggregates(tgt_cursor, target_table_full, modulus)
+    mismatched = sorted(b for b in set(source) | set(target) if source.get(b) != target.get(b))
+    result = {
+        "source_rows": sum(count for count, _ in source.values()),
+        "target_rows": sum(count for count, _ in target.values()),
+        "mismatched_buckets": len(mismatched),
+        "missing": [],
+        "extra": [],
+        "complete": True,
+    }
+    while mismatched:
+        if len(mismatched) > RECONCILE_MAX_DRILL_BUCKETS:
+            logger.warning(f"{len(mismatched)} mismatched buckets between {source_table_full} and {target_table_full}; "
+                           f"too many differences to list.")
+            result["complete"] = False
+            break
+        last_level = modulus * buckets > 2 ** 31
+        small = [b for b in mismatched
+                 if last_level or max(source.get(b, (0, 0))[0], target.get(b, (0, 0))[0]) <= drill_rows]
+        if small:
+            source_recids = bucket_recids(src_cursor, source_table_full, modulus, small)
+            target_recids = bucket_recids(tgt_cursor, target_table_full, modulus, small)
+            result["missing"].extend(sorted((source_recids - target_recids).elements()))
+            result["extra"].extend(sorted((target_recids - source_recids).elements()))
+        small = set(small)
+        large = [b for b in mismatched if b not in small]
+        if not large:
+            break
+        parent_modulus, modulus = modulus, modulus * buckets
+        source = bucket_aggregates(src_cursor, source_table_full, modulus, large, parent_modulus)
+        target = bucket_aggregates(tgt_cursor, target_table_full, modulus, large, parent_modulus)
+        mismatched = sorted(b for b in set(source) | set(target) if source.get(b) != target.get(b))
+    src_cursor.close()
+    tgt_cursor.close()
+    return result
+
+def reconcile_table(config, tbl):
+    """
+    Reconcile one table's source and target. Returns the result of reconcile() plus
+    "seconds", or None if the table cannot be reconciled (file sinks, incremental tables).
+    """
+    source_conf = config["source"]
+    target_conf = config["target"]
+    default_conf = config["default"]
+    sink_type = str(tbl.get("sink", default_conf.get("sink", "sqlserver")) or "sqlserver").lower()
+    if sink_type != "sqlserver":
+        logger.info(f"Skipping reconciliation of table '{tbl['table']}': rows are exported to {sink_type} files.")
+        return None
+    if tbl.get("incremental_column", "").strip() and not tbl.get("change_detection", False):
+        logger.info(f"Skipping reconciliation of table '{tbl['table']}': incremental loads only hold the new rows.")
+        return None
+    source_table_full = f"[{source_conf['schema']}].[{tbl['table']}]"
+    target_table_full = f"[{target_conf['schema']}].[{tbl['target_table']}]"
+    src_conn = get_connection(source_conf["server"], source_conf["database"], source_conf["username"], source_conf["password"])
+    try:
+        tgt_conn = get_connection(target_conf["server"], target_conf["database"], target_conf["username"], target_conf["password"])
+        try:
+            started = time.perf_counter()
+            result = reconcile(src_conn, source_table_full, tgt_conn, target_table_full,
+                               int(default_conf.get("reconcile_buckets", RECONCILE_BUCKETS)),
+                               int(default_conf.get("reconcile_drill_rows", RECONCILE_DRILL_ROWS)))
+            result["seconds"] = time.perf_counter() - started
+        finally:
+            tgt_conn.close()
+    finally:
+        src_conn.close()
+    log_reconciliation(tbl, result)
+    return result
+
+def log_reconciliation(tbl, result):
+    if not result["mismatched_buckets"]:
+        logger.info(f"Reconciliation of table '{tbl['table']}': {result['source_rows']} source and "
+                    f"{result['target_rows']} target rows match ({result['seconds']:.1f}s).")
+        return
+    logger.error(f"Reconciliation of table '{tbl['table']}' found differences: {result['source_rows']} source rows, "
+                 f"{result['target_rows']} target rows, {result['mismatched_buckets']} mismatched buckets, "
+                 f"{len(result['missing'])} missing and {len(result['extra'])} extra RECIDs ({result['seconds']:.1f}s).")
+    for label, recids in [("Missing", result["missing"]), ("Extra", result["extra"])]:
+        if recids:
+            more = f" (and {len(recids) - RECONCILE_LOG_RECIDS} more)" if len(recids) > RECONCILE_LOG_RECIDS else ""
+            logger.error(f"  {label} in target: {', '.join(str(r) for r in recids[:RECONCILE_LOG_RECIDS])}{more}")
+
+def verify(config):
+    """Reconcile every enabled table without loading anything. Returns {table: result}."""
+    results = {}
+    for tbl in config["tables"]:
+        if not tbl.get("enabled", True):
+            continue
+        try:
+            result = reconcile_table(config, tbl)
+        except Exception as e:
+            logger.error(f"Reconciliation failed for table '{tbl['table']}': {e}")
+            continue
+        if result is not None:
+            results[tbl["table"]] = result
+    return results
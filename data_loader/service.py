@@ -0,0 +1,172 @@
+# data_loader/service.py
+import json
+import time
+import queue
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from .config import load_config
+from .database import enable_pooling, close_pooled_connections
+from .extraction import enable_view_cache
+from .logging import logger
+
+DEFAULT_SERVE_HOST = "127.0.0.1"
+DEFAULT_SERVE_PORT = 8765
+# Number of finished table runs kept for GET /status.
+RECENT_RUNS = 50
+
+class LoaderService:
+    """
+    Long-running data loader: keeps connections and view definitions warm and runs tables
+    on request (POST /run) or, for change-detection tables, every poll_interval seconds.
+
+    Requests are queued and run one table at a time by a single runner thread; a table
+    that is already queued is not queued twice. The config file is read again for every
+    run, so table changes apply without a restart.
+    """
+
+    def __init__(self, state, run_table, owner, lock_timeout, poll_interval=0):
+        self.state = state
+        self.run_table = run_table
+        self.owner = owner
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self.requests = queue.Queue()
+        self.queued = set()
+        self.running = None
+        self.recent = []
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+
+    def request_run(self, tables=None, delta_only=False):
+        """
+        Queue the given source tables (all enabled tables if None). With delta_only only tables
+        whose deltas are applied in place (change_detection) are queued. Returns the names queued.
+        """
+        config = load_config()
+        queued = []
+        for tbl in config["tables"]:
+            if not tbl.get("enabled", True):
+                continue
+            if tables is not None and tbl["table"] not in tables and tbl["target_table"] not in tables:
+                continue
+            # incremental_column loads recreate the target with the new rows only, so polling them
+            # would leave the target holding just the last micro-batch (or nothing).
+            if delta_only and not tbl.get("change_detection", False):
+                continue
+            with self.lock:
+                if tbl["table"] in self.queued:
+                    continue
+                self.queued.add(tbl["table"])
+            self.requests.put(tbl["table"])
+            queued.append(tbl["table"])
+        return queued
+
+    def status(self):
+        with self.lock:
+            return {
+                "running": self.running,
+                "queued": sorted(self.queued),
+                "poll_interval": self.poll_interval,
+                "recent": list(self.recent),
+            }
+
+    def run_forever(self):
+        """Process queued tables until stop() is called."""
+        while not self.stopping.is_set():
+            try:
+                name = self.requests.get(timeout=1)
+            except queue.Empty:
+                continue
+            with self.lock:
+                self.queued.discard(name)
+                self.running = name
+            config = load_config()
+            tbl = next((t for t in config["tables"] if t["table"] == name and t.get("enabled", True)), None)
+            started = time.time()
+            summary = None
+            if tbl is not None:
+                try:
+                    summary = self.run_table(config, tbl, self.state, self.owner, self.lock_timeout)
+                except Exception as e:
+                    logger.error(f"Service run of table '{name}' failed: {e}")
+            with self.lock:
+                self.running = None
+                self.recent.append({"table": name, "started": started, "seconds": time.time() - started,
+                                    "status": "success" if summary is not None else "failed",
+                                    "rows": summary["rows"] if summary else None})
+                del self.recent[:-RECENT_RUNS]
+
+    def poll_forever(self):
+        """Queue the change-detection tables every poll_interval seconds (micro-batches)."""
+        while not self.stopping.wait(self.poll_interval):
+            self.request_run(delta_only=True)
+
+    def stop(self):
+        self.stopping.set()
+
+def make_handler(service):
+    class RequestHandler(BaseHTTPRequestHandler):
+        """GET /status; POST /run with an optional JSON body {"tables": [...]}."""
+
+        def send_json(self, code, body):
+            data = json.dumps(body, default=str).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/status":
+                self.send_json(200, service.status())
+            else:
+                self.send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/run":
+                self.send_json(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                tables = body.get("tables")
+            except (ValueError, AttributeError) as e:
+                self.send_json(400, {"error": f"invalid request body: {e}"})
+                return
+            self.send_json(202, {"queued": service.request_run(tables)})
+
+        def log_message(self, format, *args):
+            logger.debug(f"Service request from {self.address_string()}: {format % args}")
+
+    return RequestHandler
+
+def serve(state, run_table, owner, lock_timeout, default_conf, host=DEFAULT_SERVE_HOST, port=DEFAULT_SERVE_PORT,
+          poll_interval=0):
+    """
+    Run the data loader as a service until interrupted. Connections are pooled
+    (pool_size per database) and view definitions cached for view_cache_seconds.
+    """
+    enable_pooling(int(default_conf.get("pool_size", 8)))
+    enable_view_cache(int(default_conf.get("view_cache_seconds", 300)))
+    service = LoaderService(state, run_table, owner, lock_timeout, poll_interval)
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    runner = threading.Thread(target=service.run_forever, daemon=True)
+    threads = [runner, threading.Thread(target=server.serve_forever, daemon=True)]
+    if poll_interval > 0:
+        threads.append(threading.Thread(target=service.poll_forever, daemon=True))
+        service.request_run(delta_only=True)
+    for thread in threads:
+        thread.start()
+    polling = f"polling change-detection tables every {poll_interval}s" if poll_interval > 0 else "polling disabled"
+    logger.info(f"Data loader service listening on http://{host}:{port} ({polling}).")
+    try:
+        while not service.stopping.wait(1):
+            pass
+    except KeyboardInterrupt:
+        logger.info("Stopping data loader service; waiting for the running table to finish...")
+    finally:
+        service.stop()
+        server.shutdown()
+        server.server_close()
+        runner.join()
+        close_pooled_connections()
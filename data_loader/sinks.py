@@ -0,0 +1,289 @@
+# data_loader/sinks.py
+import os
+import io
+import csv
+import json
+import glob
+import gzip
+import bz2
+import lzma
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .config import get_base_dir
+from .database import get_connection
+from .loader import get_storage_options, COLUMNSTORE_MIN_ROWGROUP, create_target_table, swap_in_shadow_table, load_data_to_target_multi, target_table_exists, delete_recids, log_progress
+from .post_load import get_index_options, key_column_types, build_indexes
+from .logging import logger
+
+# Default directory for file exports (relative paths in config are resolved against the base dir).
+OUTPUT_DIR = os.path.join(get_base_dir(), "output")
+
+# File openers per compression setting: (extension, function wrapping a raw binary file).
+COMPRESSORS = {
+    "none": ("", lambda raw: raw),
+    "gzip": (".gz", lambda raw: gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6)),
+    "bz2": (".bz2", lambda raw: bz2.BZ2File(raw, mode="wb")),
+    "xz": (".xz", lambda raw: lzma.LZMAFile(raw, mode="wb")),
+}
+
+# glob pattern of the run id in export file names (time.strftime("%Y%m%d_%H%M%S")).
+RUN_ID_PATTERN = "[0-9]" * 8 + "_" + "[0-9]" * 6
+
+# How often (in rows) a file writer checks the size of its current file for rollover.
+ROLLOVER_CHECK_ROWS = 1000
+
+class SqlServerSink:
+    """
+    Write rows to the target SQL Server table (drop/create, delete by RECID and multithreaded insert).
+    With reload_mode "swap" a full reload goes into <target_table>__load, which replaces the
+    live table in publish() once loading and indexing are complete.
+    """
+
+    def __init__(self, tgt_conn_params, target_schema, target_table, tuners, storage=None, index_options=None,
+                 reload_mode="drop"):
+        self.tgt_conn_params = tgt_conn_params
+        self.target_schema = target_schema
+        self.target_table = target_table
+        self.tuners = tuners
+        self.storage = storage or {}
+        self.index_options = index_options
+        self.reload_mode = reload_mode
+        # Table the rows are written to: the live table, or the shadow table during a swap reload.
+        self.load_table = target_table
+        self.header = None
+
+    def describe(self):
+        return f"target table [{self.target_schema}].[{self.target_table}]"
+
+    def exists(self):
+        """Return True if the destination already holds data from a previous run."""
+        tgt_conn = get_connection(*self.tgt_conn_params)
+        try:
+            return target_table_exists(tgt_conn, self.target_schema, self.target_table)
+        finally:
+            tgt_conn.close()
+
+    def begin(self, header, replace):
+        """Prepare the destination; replace=True drops and recreates the target (or shadow) table."""
+        self.header = header
+        if replace:
+            if self.reload_mode == "swap":
+                self.load_table = f"{self.target_table}__load"
+                logger.info(f"Loading into shadow table [{self.target_schema}].[{self.load_table}]; "
+                            f"the live table stays available until the swap.")
+            tgt_conn = get_connection(*self.tgt_conn_params)
+            create_target_table(tgt_conn, self.target_schema, self.load_table, header, self.storage,
+                                key_column_types(self.index_options))
+            tgt_conn.close()
+
+    def delete(self, recids):
+        """Remove the given RECIDs from the destination (delta loads)."""
+        tgt_conn = get_connection(*self.tgt_conn_params)
+        delete_recids(tgt_conn, self.target_schema, self.target_table, recids, self.tuners["chunk_size"].value)
+        tgt_conn.close()
+
+    def write(self, rows):
+        if self.storage.get("columnstore") and self.tuners["chunk_size"].value < COLUMNSTORE_MIN_ROWGROUP:
+            logger.info(f"Chunks smaller than {COLUMNSTORE_MIN_ROWGROUP} rows go to delta rowgroups of the columnstore "
+                        f"{self.describe()}; consider chunk_size >= {COLUMNSTORE_MIN_ROWGROUP} with tablock.")
+        load_data_to_target_multi(self.tgt_conn_params, self.target_schema, self.load_table, self.header, rows,
+                                  self.tuners["insert_threads"].value, self.tuners["chunk_size"].value,
+                                  chunk_tuner=self.tuners["chunk_size"], worker_tuner=self.tuners["insert_threads"],
+                                  tablock=self.storage.get("tablock", False))
+
+    def finish(self):
+        pass
+
+    def post_load(self):
+        """Build the configured indexes and statistics after the load. Returns a list of (step, seconds)."""
+        if not self.index_options:
+            return []
+        tgt_conn = get_connection(*self.tgt_conn_params)
+        try:
+            return build_indexes(tgt_conn, self.target_schema, self.load_table, self.index_options,
+                                 columnstore=self.storage.get("columnstore", False))
+        finally:
+            tgt_conn.close()
+
+    def publish(self):
+        """Make the loaded data visible: swap the shadow table in (no-op when loading in place)."""
+        if self.load_table == self.target_table:
+            return
+        tgt_conn = get_connection(*self.tgt_conn_params)
+        try:
+            swap_in_shadow_table(tgt_conn, self.target_schema, self.target_table, self.load_table)
+        finally:
+            tgt_conn.close()
+        self.load_table = self.target_table
+
+class FileSink:
+    """
+    Base class for partitioned, compressed file exports.
+
+    Rows are split into one contiguous partition per writer thread; every writer
+    produces its own series of files and starts a new file once the current one
+    reaches max_file_size bytes (on disk, i.e. after compression). Files are named
+    <target_table>-<run>-<partition>-<seq><ext>. A full reload removes the files of
+    previous runs; delta runs add new files plus a <target_table>-<run>-deleted file
+    listing the RECIDs to remove before the run's rows are applied (one RECID column).
+    """
+
+    extension = ""
+
+    def __init__(self, output_dir, target_table, threads, compression="gzip", max_file_size=268435456):
+        if compression not in COMPRESSORS:
+            raise ValueError(f"Unsupported output compression '{compression}'. Use one of: {', '.join(COMPRESSORS)}")
+        self.output_dir = output_dir
+        self.target_table = target_table
+        self.threads = max(1, int(threads))
+        self.compression = compression
+        self.max_file_size = int(max_file_size)
+        self.run_id = time.strftime("%Y%m%d_%H%M%S")
+        self.header = None
+        self.files = []
+        self._next_part = 0
+
+    def describe(self):
+        return f"{self.extension.lstrip('.')} files in {self.output_dir}"
+
+    def _pattern(self):
+        # Anchored on the run id so that the files of ACCT-HIST do not match those of ACCT.
+        return os.path.join(self.output_dir, f"{glob.escape(self.target_table)}-{RUN_ID_PATTERN}-*{self.extension}*")
+
+    def exists(self):
+        return bool(glob.glob(self._pattern()))
+
+    def begin(self, header, replace):
+        self.header = header
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        if replace:
+            for path in glob.glob(self._pattern()):
+                os.remove(path)
+            logger.info(f"Removed previous export files for '{self.target_table}' from {self.output_dir}.")
+
+    def _open(self, name):
+        ext, wrap = COMPRESSORS[self.compression]
+        path = os.path.join(self.output_dir, name + ext)
+        raw = open(path, "wb")
+        stream = wrap(raw)
+        text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+        return path, raw, text
+
+    def _write_partition(self, part_no, rows):
+        """Write one partition of rows, rolling over to a new file at max_file_size. Returns the files written."""
+        written = []
+        seq = 0
+        raw = text = None
+        for i, row in enumerate(rows):
+            if text is None:
+                path, raw, text = self._open(f"{self.target_table}-{self.run_id}-{part_no:04d}-{seq:05d}{self.extension}")
+                written.append(path)
+                write_row = self.row_writer(text, self.header)
+            write_row(row)
+            if (i + 1) % ROLLOVER_CHECK_ROWS == 0:
+                text.flush()
+                if raw.tell() >= self.max_file_size:
+                    text.close()
+                    raw.close()
+                    text = None
+                    seq += 1
+        if text is not None:
+            text.close()
+            raw.close()
+        return written
+
+    def delete(self, recids):
+        if not recids:
+            return
+        path, raw, text = self._open(f"{self.target_table}-{self.run_id}-deleted{self.extension}")
+        write_row = self.row_writer(text, ["RECID"])
+        for recid in recids:
+            write_row((recid,))
+        text.close()
+        raw.close()
+        self.files.append(path)
+        logger.info(f"Wrote {len(recids)} deleted RECIDs to {path}.")
+
+    def write(self, rows):
+        """Write a processing.RowBatch; each partition iterates over its slice of the batch."""
+        total_rows = len(rows)
+        n_parts = min(self.threads, max(1, total_rows))
+        part_size = -(-total_rows // n_parts)
+        logger.info(f"Writing {total_rows} rows to {self.describe()} using {n_parts} threads...")
+        started = time.perf_counter()
+        written = 0
+        with ThreadPoolExecutor(max_workers=n_parts) as executor:
+            futures = {}
+            for n in range(n_parts):
+                start, stop = n * part_size, min((n + 1) * part_size, total_rows)
+                part = rows.iter_rows(start, stop)
+                futures[executor.submit(self._write_partition, self._next_part + n, part)] = stop - start
+            self._next_part += n_parts
+            for future in as_completed(futures):
+                self.files.extend(future.result())
+                written += futures[future]
+                log_progress(self.target_table, written, total_rows, time.perf_counter() - started)
+
+    def finish(self):
+        logger.info(f"Export for '{self.target_table}' produced {len(self.files)} files.")
+
+    def post_load(self):
+        return []
+
+    def publish(self):
+        pass
+
+    def row_writer(self, text, header):
+        """Start a new file on the text stream and return a function writing one row to it."""
+        raise NotImplementedError
+
+class CsvSink(FileSink):
+    """Export rows as CSV files with a header line in every file."""
+
+    extension = ".csv"
+
+    def row_writer(self, text, header):
+        writer = csv.writer(text)
+        writer.writerow(header)
+        return writer.writerow
+
+class JsonLinesSink(FileSink):
+    """Export rows as JSON Lines files (one object per row, keyed by column name)."""
+
+    extension = ".jsonl"
+
+    def row_writer(self, text, header):
+        def write_row(row):
+            text.write(json.dumps(dict(zip(header, row)), ensure_ascii=False, default=str))
+            text.write("\n")
+        return write_row
+
+def get_sink(config, tbl, tuners):
+    """
+    Return the sink configured for a table ("sink": "sqlserver" (default), "csv" or "jsonl").
+    File sinks use output_dir, output_compression and output_max_file_size from the default section.
+    """
+    target_conf = config["target"]
+    default_conf = config["default"]
+    sink_type = str(tbl.get("sink", default_conf.get("sink", "sqlserver")) or "sqlserver").lower()
+    if sink_type == "sqlserver":
+        tgt_conn_params = (target_conf["server"], target_conf["database"], target_conf["username"], target_conf["password"])
+        reload_mode = str(tbl.get("reload_mode", default_conf.get("reload_mode", "drop")) or "drop").lower()
+        if reload_mode not in ["drop", "swap"]:
+            raise ValueError(f"Unknown reload_mode '{reload_mode}' for table '{tbl['table']}'. Use drop or swap.")
+        return SqlServerSink(tgt_conn_params, target_conf["schema"], tbl["target_table"], tuners,
+                             get_storage_options(default_conf, tbl), get_index_options(tbl), reload_mode)
+
+    output_dir = default_conf.get("output_dir") or OUTPUT_DIR
+    if not os.path.isabs(output_dir):
+        output_dir = os.path.join(get_base_dir(), output_dir)
+    options = dict(
+        compression=str(default_conf.get("output_compression", "gzip")).lower(),
+        max_file_size=int(default_conf.get("output_max_file_size", 268435456)),
+    )
+    if sink_type == "csv":
+        return CsvSink(output_dir, tbl["target_table"], tuners["insert_threads"].value, **options)
+    if sink_type == "jsonl":
+        return JsonLinesSink(output_dir, tbl["target_table"], tuners["insert_threads"].value, **options)
+    raise ValueError(f"Unknown sink '{sink_type}' for table '{tbl['table']}'. Use sqlserver, csv or jsonl.")
@@ -0,0 +1,167 @@
+# data_loader/spill.py
+import os
+import mmap
+import struct
+import itertools
+from array import array
+from .config import get_base_dir
+from .processing import RowBatch
+from .logging import logger
+
+# Default directory for spill segment files (override with "spill_dir" in the default section).
+SPILL_DIR = os.path.join(get_base_dir(), "spill")
+
+# Rows written to one segment file.
+SEGMENT_ROWS = 50000
+
+# Segment file header: magic, number of rows, number of columns.
+SEGMENT_HEADER = struct.Struct("<4sII")
+SEGMENT_MAGIC = b"DLS1"
+
+class Segment:
+    """
+    One spilled batch in a memory-mapped file. The layout is columnar: for every
+    column an array of n+1 uint64 byte offsets followed by the UTF-8 values.
+    """
+
+    __slots__ = ("path", "n_rows", "columns", "_file", "_map")
+
+    def __init__(self, path, batch):
+        self.path = path
+        self.n_rows = len(batch)
+        self.columns = []
+        with open(path, "wb") as f:
+            f.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, self.n_rows, len(batch.columns)))
+            position = SEGMENT_HEADER.size
+            for column in batch.columns:
+                encoded = [value.encode("utf-8") for value in column]
+                offsets = array("Q", itertools.accumulate(itertools.chain([0], map(len, encoded))))
+                f.write(offsets.tobytes())
+                data_position = position + offsets.itemsize * len(offsets)
+                f.write(b"".join(encoded))
+                self.columns.append((position, data_position))
+                position = data_position + offsets[-1]
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read_columns(self, start, stop):
+        """Return the values of rows start..stop as one list per column."""
+        data = self._map
+        result = []
+        for offsets_position, data_position in self.columns:
+            offsets = array("Q")
+            offsets.frombytes(data[offsets_position + 8 * start:offsets_position + 8 * (stop + 1)])
+            result.append([
+                data[data_position + offsets[i]:data_position + offsets[i + 1]].decode("utf-8")
+                for i in range(stop - start)
+            ])
+        return result
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+        os.remove(self.path)
+
+class SpillBuffer:
+    """
+    Parsed rows of a table with a cap on the rows held in memory.
+
+    The first memory_rows rows stay in a RowBatch; later rows are collected into
+    segments of SEGMENT_ROWS and written to memory-mapped files in spill_dir, so the
+    source read can finish at full speed while memory stays bounded. The loader
+    replays the segments at its own pace through rows()/iter_rows(), which have the
+    same meaning as on RowBatch. Call close() to remove the segment files.
+    """
+
+    def __init__(self, names, memory_rows, spill_dir=None, name="spill"):
+        self.names = list(names)
+        self.memory_rows = int(memory_rows)
+        self.spill_dir = spill_dir or SPILL_DIR
+        self.name = name
+        self.memory = RowBatch(self.names)
+        self.pending = RowBatch(self.names)
+        self.segments = []
+        self.constants = []
+
+    @property
+    def header(self):
+        return self.names + [name for name, _ in self.constants]
+
+    def __len__(self):
+        return len(self.memory) + len(self.pending) + sum(segment.n_rows for segment in self.segments)
+
+    def add_constant(self, name, value):
+        self.constants.append((name, value))
+
+    def extend(self, batch):
+        """Add a parsed RowBatch; rows beyond memory_rows go to spill segments."""
+        room = self.memory_rows - len(self.memory)
+        if room >= len(batch) and not self.segments and not len(self.pending):
+            self.memory.extend(batch)
+            return
+        if room > 0 and not self.segments and not len(self.pending):
+            head = RowBatch(self.names)
+            head.columns = [column[:room] for column in batch.columns]
+            self.memory.extend(head)
+            batch.columns = [column[room:] for column in batch.columns]
+        self.pending.extend(batch)
+        if len(self.pending) >= SEGMENT_ROWS:
+            self._spill()
+
+    def _spill(self):
+        if not os.path.exists(self.spill_dir):
+            os.makedirs(self.spill_dir)
+        path = os.path.join(self.spill_dir, f"{self.name}-{os.getpid()}-{len(self.segments):05d}.seg")
+        self.segments.append(Segment(path, self.pending))
+        if len(self.segments) == 1:
+            logger.info(f"Spilling parsed rows of '{self.name}' beyond {self.memory_rows} rows to {self.spill_dir}.")
+        self.pending = RowBatch(self.names)
+
+    def finish(self):
+        """Write the remaining rows of the last segment once extraction is complete."""
+        if len(self.pending) and self.segments:
+            self._spill()
+        if self.segments:
+            size = sum(os.path.getsize(segment.path) for segment in self.segments)
+            logger.info(f"Spilled {sum(segment.n_rows for segment in self.segments)} rows of '{self.name}' "
+                        f"to {len(self.segments)} segment files ({size / 1048576:.1f} MB).")
+
+    def _parts(self):
+        """Yield (n_rows, read_columns(start, stop)) for the memory batch, the segments and pending rows."""
+        yield len(self.memory), lambda a, b: [column[a:b] for column in self.memory.columns]
+        for segment in self.segments:
+            yield segment.n_rows, segment.read_columns
+        yield len(self.pending), lambda a, b: [column[a:b] for column in self.pending.columns]
+
+    def iter_rows(self, start=0, stop=None):
+        stop = len(self) if stop is None else stop
+        constants = [value for _, value in self.constants]
+        position = 0
+        for n_rows, read_columns in self._parts():
+            a, b = max(start - position, 0), min(stop - position, n_rows)
+            if a < b:
+                yield from zip(*read_columns(a, b), *[itertools.repeat(value) for value in constants])
+            position += n_rows
+            if position >= stop:
+                break
+
+    def rows(self, start=0, stop=None):
+        return list(self.iter_rows(start, stop))
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+def get_spill_buffer(default_conf, tbl, names):
+    """
+    Return a SpillBuffer for a table if spill_rows (per table or in default) is set, otherwise None.
+    spill_dir in the default section overrides the segment directory (relative to the base dir).
+    """
+    memory_rows = int(tbl.get("spill_rows", default_conf.get("spill_rows", 0)) or 0)
+    if memory_rows <= 0:
+        return None
+    spill_dir = default_conf.get("spill_dir") or SPILL_DIR
+    if not os.path.isabs(spill_dir):
+        spill_dir = os.path.join(get_base_dir(), spill_dir)
+    return SpillBuffer(names, memory_rows, spill_dir, tbl["target_table"])
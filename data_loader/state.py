@@ -0,0 +1,354 @@
+# data_loader/state.py
+import os
+import sys
+import time
+import socket
+import sqlite3
+import threading
+from .config import get_base_dir
+from .logging import logger
+
+# Default location of the run-state database (override with "state_path" in the default section).
+STATE_FILE = os.path.join(get_base_dir(), "state", "run_state.sqlite")
+
+# Seconds a table lock is held before another run may take it over.
+DEFAULT_LOCK_TIMEOUT = 43200
+
+# File system types (from /proc/mounts) treated as network storage.
+NETWORK_FILESYSTEMS = {"nfs", "nfs4", "cifs", "smbfs", "smb3", "fuse.sshfs"}
+
+def default_owner():
+    """Identify this process in locks and run records."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def process_alive(pid):
+    """Return False if no process with this pid is running on this host (True when unsure)."""
+    if sys.platform == "win32":
+        import ctypes
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            # ERROR_INVALID_PARAMETER: there is no such process; anything else (access denied) means it exists.
+            return ctypes.get_last_error() != 87
+        try:
+            exit_code = ctypes.c_ulong()
+            if kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+                return exit_code.value == 259  # STILL_ACTIVE
+            return True
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+def is_network_path(path):
+    """Return True if path is on network storage (UNC path or network drive on Windows, NFS/SMB mount elsewhere)."""
+    path = os.path.abspath(path)
+    if sys.platform == "win32":
+        if path.startswith("\\\\"):
+            return True
+        import ctypes
+        return ctypes.windll.kernel32.GetDriveTypeW(os.path.splitdrive(path)[0] + "\\") == 4  # DRIVE_REMOTE
+    try:
+        with open("/proc/mounts") as f:
+            mounts = [line.split()[1:3] for line in f]
+    except OSError:
+        return False
+    # The longest mount point containing the path decides.
+    fs_type = None
+    longest = -1
+    for mount_point, mount_type in mounts:
+        if (path == mount_point or path.startswith(mount_point.rstrip("/") + "/")) and len(mount_point) > longest:
+            fs_type, longest = mount_type, len(mount_point)
+    return fs_type in NETWORK_FILESYSTEMS
+
+def owner_is_dead(owner):
+    """Return True if owner (see default_owner) is a process of this host that is no longer running."""
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit() or int(pid) == os.getpid():
+        return False
+    return not process_alive(int(pid))
+
+class StateStore:
+    """
+    Transactional run state kept in SQLite, separate from config.json.
+
+    Holds the incremental watermark per target table, a record of every table run
+    and per-table locks. Each update is its own short transaction, so concurrent
+    runs and the config editor never overwrite each other's progress, and a crash
+    only loses the table that was in flight.
+
+    Local databases use WAL mode. WAL needs shared memory and does not work over network
+    file systems, so a database on network storage (workers on several hosts) uses a
+    rollback journal and relies on the file system's byte-range locks instead.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or STATE_FILE
+        state_dir = os.path.dirname(self.path)
+        if state_dir and not os.path.exists(state_dir):
+            os.makedirs(state_dir)
+        # isolation_level=None: transactions are managed explicitly with BEGIN IMMEDIATE.
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        # The connection may be shared by several threads of one process.
+        self.lock = threading.RLock()
+        if is_network_path(self.path):
+            logger.info(f"State database {self.path} is on network storage; using a rollback journal instead of WAL.")
+            self.conn.execute("PRAGMA journal_mode=DELETE")
+            self.conn.execute("PRAGMA synchronous=FULL")
+        else:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS watermarks (
+                target_table TEXT PRIMARY KEY,
+                column_name TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                target_table TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                finished_at REAL,
+                status TEXT NOT NULL,
+                rows INTEGER,
+                extract_seconds REAL,
+                load_seconds REAL,
+                post_load_seconds REAL,
+                message TEXT
+            );
+            CREATE TABLE IF NOT EXISTS locks (
+                target_table TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                acquired_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS change_index (
+                target_table TEXT PRIMARY KEY,
+                token TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS work_queue (
+                batch TEXT NOT NULL,
+                target_table TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                owner TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (batch, target_table)
+            );
+        """)
+
+    def transaction(self):
+        """Context manager for a write transaction (BEGIN IMMEDIATE ... COMMIT/ROLLBACK)."""
+        return _Transaction(self.conn, self.lock)
+
+    def get_watermark(self, target_table, column_name):
+        """Return the stored watermark for the table, or None if there is none for this column."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM watermarks WHERE target_table = ? AND column_name = ?", (target_table, column_name)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_index_token(self, target_table):
+        """Return (token, owner) of the last committed change index of a table, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT token, owner FROM change_index WHERE target_table = ?", (target_table,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def set_index_token(self, target_table, token, owner):
+        """Record the token of a table's change index after it was committed (see ChangeTracker)."""
+        with self.transaction():
+            self.conn.execute(
+                "INSERT OR REPLACE INTO change_index (target_table, token, owner, updated_at) VALUES (?, ?, ?, ?)",
+                (target_table, token, owner, time.time()),
+            )
+
+    def reset_watermark(self, target_table):
+        """Delete the stored watermark of a table; returns False if there was none."""
+        with self.transaction():
+            cursor = self.conn.execute("DELETE FROM watermarks WHERE target_table = ?", (target_table,))
+        return cursor.rowcount > 0
+
+    def acquire_lock(self, target_table, owner, timeout=DEFAULT_LOCK_TIMEOUT):
+        """
+        Take the lock of a table; returns False if another owner holds an unexpired lock.
+        Locks of crashed processes on this host are taken over without waiting for the timeout.
+        """
+        now = time.time()
+        with self.transaction():
+            row = self.conn.execute("SELECT owner, expires_at FROM locks WHERE target_table = ?", (target_table,)).fetchone()
+            if row and row[0] != owner and row[1] > now and not owner_is_dead(row[0]):
+                return False
+            if row and row[0] != owner:
+                reason = "expired" if row[1] <= now else "its process is no longer running"
+                logger.warning(f"Taking over lock on '{target_table}' held by {row[0]} ({reason}).")
+            self.conn.execute(
+                "INSERT OR REPLACE INTO locks (target_table, owner, acquired_at, expires_at) VALUES (?, ?, ?, ?)",
+                (target_table, owner, now, now + timeout),
+            )
+        return True
+
+    def lock_owner(self, target_table):
+        """Return the owner of a table's lock, or None if it is not locked."""
+        with self.lock:
+            row = self.conn.execute("SELECT owner FROM locks WHERE target_table = ?", (target_table,)).fetchone()
+        return row[0] if row else None
+
+    def renew_lock(self, target_table, owner, timeout=DEFAULT_LOCK_TIMEOUT):
+        """Extend a lock held by owner (heartbeat); returns False if the lock is no longer held."""
+        with self.transaction():
+            cursor = self.conn.execute(
+                "UPDATE locks SET expires_at = ? WHERE target_table = ? AND owner = ?",
+                (time.time() + timeout, target_table, owner),
+            )
+        return cursor.rowcount > 0
+
+    def release_lock(self, target_table, owner):
+        with self.transaction():
+            self.conn.execute("DELETE FROM locks WHERE target_table = ? AND owner = ?", (target_table, owner))
+
+    def enqueue_work(self, batch, target_tables):
+        """Add the tables to the work queue of a batch; tables already queued keep their status."""
+        now = time.time()
+        with self.transaction():
+            for seq, target_table in enumerate(target_tables):
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO work_queue (batch, target_table, seq, status, updated_at)"
+                    " VALUES (?, ?, ?, 'pending', ?)",
+                    (batch, target_table, seq, now),
+                )
+
+    def claim_work(self, batch, owner, lease_seconds, max_attempts):
+        """
+        Claim the next table of a batch and take its lock for lease_seconds. Pending tables are
+        claimed in queue order; a running table whose lock has expired (its worker died) is
+        claimed again until it has been attempted max_attempts times. Returns the target table or None.
+        """
+        now = time.time()
+        # A running table is abandoned once its lease has expired, or, if its lock is already
+        # released, when it was not marked finished within a lease period.
+        abandoned = ("(l.expires_at <= :now OR (l.target_table IS NULL AND q.updated_at <= :now - :lease))")
+        params = {"batch": batch, "owner": owner, "now": now, "lease": lease_seconds, "max_attempts": max_attempts}
+        with self.transaction():
+            # Tables whose worker died on the last allowed attempt are given up.
+            self.conn.execute(
+                "UPDATE work_queue SET status = 'failed', updated_at = :now WHERE batch = :batch AND target_table IN ("
+                " SELECT q.target_table FROM work_queue q LEFT JOIN locks l ON l.target_table = q.target_table"
+                f" WHERE q.batch = :batch AND q.status = 'running' AND q.attempts >= :max_attempts AND {abandoned})",
+                params,
+            )
+            row = self.conn.execute(
+                "SELECT q.target_table FROM work_queue q LEFT JOIN locks l ON l.target_table = q.target_table"
+                " WHERE q.batch = :batch AND q.attempts < :max_attempts AND ("
+                " (q.status = 'pending' AND (l.target_table IS NULL OR l.owner = :owner OR l.expires_at <= :now))"
+                f" OR (q.status = 'running' AND {abandoned}))"
+                " ORDER BY q.status = 'running', q.seq LIMIT 1",
+                params,
+            ).fetchone()
+            if row is None:
+                return None
+            target_table = row[0]
+            self.conn.execute(
+                "INSERT OR REPLACE INTO locks (target_table, owner, acquired_at, expires_at) VALUES (?, ?, ?, ?)",
+                (target_table, owner, now, now + lease_seconds),
+            )
+            self.conn.execute(
+                "UPDATE work_queue SET status = 'running', owner = ?, attempts = attempts + 1, updated_at = ?"
+                " WHERE batch = ? AND target_table = ?",
+                (owner, now, batch, target_table),
+            )
+        return target_table
+
+    def finish_work(self, batch, target_table, owner, status):
+        """
+        Mark a claimed table of a batch as 'done' or 'failed' and release its lock in the
+        same transaction, so the table is never seen unlocked while still 'running'.
+        """
+        with self.transaction():
+            self.conn.execute(
+                "UPDATE work_queue SET status = ?, updated_at = ? WHERE batch = ? AND target_table = ? AND owner = ?",
+                (status, time.time(), batch, target_table, owner),
+            )
+            self.conn.execute("DELETE FROM locks WHERE target_table = ? AND owner = ?", (target_table, owner))
+
+    def work_status(self, batch):
+        """Return a dict of status -> number of tables for a batch."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT status, COUNT(*) FROM work_queue WHERE batch = ? GROUP BY status", (batch,)
+            ).fetchall()
+        return dict(rows)
+
+    def start_run(self, target_table, owner):
+        """Record the start of a table run and return its id."""
+        with self.transaction():
+            cursor = self.conn.execute(
+                "INSERT INTO runs (target_table, owner, started_at, status) VALUES (?, ?, ?, 'running')",
+                (target_table, owner, time.time()),
+            )
+        return cursor.lastrowid
+
+    def finish_run(self, run_id, target_table, summary=None, watermark=None, status="success", message=None):
+        """
+        Record the end of a table run. If watermark is a (column_name, value) pair the
+        table's watermark is updated in the same transaction.
+        """
+        summary = summary or {}
+        with self.transaction():
+            self.conn.execute(
+                "UPDATE runs SET finished_at = ?, status = ?, rows = ?, extract_seconds = ?, load_seconds = ?,"
+                " post_load_seconds = ?, message = ? WHERE id = ?",
+                (time.time(), status, summary.get("rows"), summary.get("extract_seconds"), summary.get("load_seconds"),
+                 summary.get("post_load_seconds"), message, run_id),
+            )
+            if watermark is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO watermarks (target_table, column_name, value, updated_at) VALUES (?, ?, ?, ?)",
+                    (target_table, watermark[0], watermark[1], time.time()),
+                )
+
+    def close(self):
+        self.conn.close()
+
+class _Transaction:
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self.lock.release()
+            raise
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.conn.execute("COMMIT")
+            else:
+                self.conn.execute("ROLLBACK")
+        finally:
+            self.lock.release()
+        return False
+
+def open_state_store(default_conf):
+    """Open the state store configured in the default section ("state_path", relative to the base dir)."""
+    path = default_conf.get("state_path") or STATE_FILE
+    if not os.path.isabs(path):
+        path = os.path.join(get_base_dir(), path)
+    return StateStore(path)
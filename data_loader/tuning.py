@@ -0,0 +1,110 @@
+# data_loader/tuning.py
+import time
+from .config import get_bool_option
+from .logging import logger
+
+# Number of samples collected before a tuner re-evaluates its setting.
+TUNING_WINDOW = 5
+# Multiplicative step applied to a setting when it is changed.
+TUNING_FACTOR = 1.25
+# Relative drop in throughput that is tolerated before the search direction is reversed.
+TUNING_TOLERANCE = 0.05
+
+class StageTuner:
+    """
+    Hill-climbing controller for one integer setting of a pipeline stage
+    (fetch size, parse workers, insert chunk size, insert workers).
+
+    Callers report completed work with record(rows, seconds). If seconds is given
+    the throughput is rows per busy second (latency driven, e.g. one fetchmany or
+    one insert); otherwise wall-clock time of the window is used (for worker counts).
+    Every TUNING_WINDOW samples the setting is moved by TUNING_FACTOR in the current
+    direction; if throughput dropped the direction is reversed. The value always
+    stays within [minimum, maximum]; with minimum == maximum the setting is static.
+    """
+
+    def __init__(self, name, value, minimum=None, maximum=None):
+        self.name = name
+        self.minimum = int(minimum if minimum is not None else value)
+        self.maximum = int(maximum if maximum is not None else value)
+        self.value = min(max(int(value), self.minimum), self.maximum)
+        self.total_rows = 0
+        self.total_seconds = 0.0
+        self._direction = 1
+        self._last_rate = None
+        self._reset_window()
+
+    @property
+    def adaptive(self):
+        return self.minimum < self.maximum
+
+    def _reset_window(self):
+        self._window_rows = 0
+        self._window_busy = 0.0
+        self._window_samples = 0
+        self._window_start = time.perf_counter()
+
+    def record(self, rows, seconds=None):
+        """Record a completed unit of work and adjust the setting at the end of each window."""
+        self.total_rows += rows
+        if seconds is not None:
+            self.total_seconds += seconds
+            self._window_busy += seconds
+        self._window_rows += rows
+        self._window_samples += 1
+        if not self.adaptive or self._window_samples < TUNING_WINDOW:
+            return
+        elapsed = self._window_busy if seconds is not None else time.perf_counter() - self._window_start
+        rate = self._window_rows / elapsed if elapsed > 0 else 0.0
+        if self._last_rate is not None and rate < self._last_rate * (1 - TUNING_TOLERANCE):
+            self._direction = -self._direction
+        self._last_rate = rate
+        self._step()
+        self._reset_window()
+
+    def _step(self):
+        old_value = self.value
+        if self._direction > 0:
+            new_value = max(int(old_value * TUNING_FACTOR), old_value + 1)
+        else:
+            new_value = min(int(old_value / TUNING_FACTOR), old_value - 1)
+        new_value = min(max(new_value, self.minimum), self.maximum)
+        if new_value == old_value:
+            # Hit a bound; search in the other direction next time.
+            self._direction = -self._direction
+            return
+        self.value = new_value
+        logger.debug(f"Auto-tuning {self.name}: {old_value} -> {new_value} ({self._last_rate:.0f} rows/sec)")
+
+    def describe(self):
+        """Return a short 'name=value' description including the measured throughput when available."""
+        if self.total_seconds > 0:
+            return f"{self.name}={self.value} ({self.total_rows / self.total_seconds:.0f} rows/sec busy)"
+        return f"{self.name}={self.value}"
+
+def build_tuners(default_conf, tbl):
+    """
+    Build the stage tuners for one table.
+
+    Static values come from the table entry (fetch_size, parse_threads, chunk_size,
+    insert_threads) and fall back to batch_size/threads from the table or the
+    default section. If autotune is enabled (per table or in default) each setting
+    is tuned between min_batch_size/max_batch_size or min_threads/max_threads.
+    Returns a dict keyed by stage name.
+    """
+    batch_size = int(tbl.get("batch_size", default_conf.get("batch_size", 1000)))
+    threads = int(tbl.get("threads", default_conf.get("threads", 4)))
+    autotune = get_bool_option(default_conf, tbl, "autotune")
+
+    if autotune:
+        size_bounds = (int(default_conf.get("min_batch_size", 100)), int(default_conf.get("max_batch_size", 50000)))
+        thread_bounds = (int(default_conf.get("min_threads", 1)), int(default_conf.get("max_threads", 16)))
+    else:
+        size_bounds = thread_bounds = (None, None)
+
+    return {
+        "fetch_size": StageTuner("fetch_size", int(tbl.get("fetch_size", batch_size)), *size_bounds),
+        "parse_threads": StageTuner("parse_threads", int(tbl.get("parse_threads", threads)), *thread_bounds),
+        "chunk_size": StageTuner("chunk_size", int(tbl.get("chunk_size", batch_size)), *size_bounds),
+        "insert_threads": StageTuner("insert_threads", int(tbl.get("insert_threads", threads)), *thread_bounds),
+    }
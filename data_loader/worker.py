@@ -0,0 +1,82 @@
+# data_loader/worker.py
+import time
+import threading
+from .logging import logger
+
+# Seconds a worker's claim on a table stays valid without a heartbeat.
+DEFAULT_LEASE_SECONDS = 120
+# Number of times a table is claimed before it is given up (a worker died on every attempt).
+DEFAULT_MAX_ATTEMPTS = 3
+
+class Heartbeat(threading.Thread):
+    """Renew the lease on a claimed table every lease_seconds / 3 until stopped."""
+
+    def __init__(self, state, target_table, owner, lease_seconds):
+        super().__init__(daemon=True)
+        self.state = state
+        self.target_table = target_table
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.lease_seconds / 3):
+            try:
+                if not self.state.renew_lock(self.target_table, self.owner, self.lease_seconds):
+                    logger.warning(f"Lease on '{self.target_table}' was lost; another worker may take the table over.")
+            except Exception as e:
+                logger.error(f"Heartbeat for '{self.target_table}' failed: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+def run_worker(config, state, run_table, batch, owner, lease_seconds=DEFAULT_LEASE_SECONDS,
+               max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Process tables of a batch from the shared work queue in the state store until none are left.
+
+    Every worker (on this or another host sharing the state database; see StateStore for
+    network storage) queues the enabled tables of the batch and then claims them one at
+    a time. A claim is a lock on the
+    target table with a short lease, renewed by a heartbeat while the table is processed.
+    If a worker dies its lease expires and another worker claims the table again.
+    While other workers still hold tables, an idle worker waits so it can take over
+    their tables if they die. Returns the list of table summaries of this worker.
+    """
+    tables = {tbl["target_table"]: tbl for tbl in config["tables"] if tbl.get("enabled", True)}
+    state.enqueue_work(batch, list(tables))
+    logger.info(f"Worker {owner} joined batch '{batch}' ({len(tables)} tables, lease {lease_seconds}s).")
+
+    run_summary = []
+    while True:
+        target_table = state.claim_work(batch, owner, lease_seconds, max_attempts)
+        if target_table is None:
+            status = state.work_status(batch)
+            if not status.get("running") and not status.get("pending"):
+                break
+            # Other workers still hold tables; wait in case one of them dies.
+            time.sleep(max(1, lease_seconds / 2))
+            continue
+        tbl = tables.get(target_table)
+        if tbl is None:
+            logger.error(f"Table '{target_table}' of batch '{batch}' is not enabled in this worker's config.")
+            state.finish_work(batch, target_table, owner, "failed")
+            continue
+
+        logger.info(f"Worker {owner} claimed table '{tbl['table']}' of batch '{batch}'.")
+        heartbeat = Heartbeat(state, target_table, owner, lease_seconds)
+        heartbeat.start()
+        summary = None
+        try:
+            # The lock stays held until finish_work, so no other worker can claim the table in between.
+            summary = run_table(config, tbl, state, owner, lease_seconds, release=False)
+        finally:
+            heartbeat.stop()
+            state.finish_work(batch, target_table, owner, "done" if summary is not None else "failed")
+        if summary is not None:
+            run_summary.append(summary)
+
+    status = state.work_status(batch)
+    logger.info(f"Batch '{batch}' finished: {status.get('done', 0)} tables done, {status.get('failed', 0)} failed.")
+    return run_summary
@@ -7,6 +7,8 @@ import sys
 import os
 import time
 import logging
+import re
+from collections import deque
 
 # For Windows, we can import this constant from subprocess (available on Python 3.7+)
 import subprocess
@@ -16,6 +18,19 @@ else:
     # Otherwise, use the constant value (0x08000000)
     CREATE_NO_WINDOW = 0x08000000
 
+# Log display limits: lines buffered between two redraws, redraw interval and lines kept in the widget.
+LOG_BUFFER_LINES = 5000
+LOG_REFRESH_MS = 200
+LOG_MAX_LINES = 5000
+
+# Lines written by the data loader that drive the progress view.
+TABLE_START_RE = re.compile(r"Processing source table '([^']+)' with view '[^']*' to target table '([^']+)'")
+PROGRESS_RE = re.compile(r"Progress for target table '([^']+)': (\d+)/(\d+) rows \((\d+) rows/sec\)")
+# Visible rows of the progress list (it scrolls, so large configs do not push the log off the window).
+PROGRESS_ROWS = 6
+PROGRESS_COLUMNS = [("table", "Target table", 240), ("percent", "Progress", 80), ("rows", "Rows", 160),
+                    ("rate", "Rows/sec", 90), ("status", "Status", 120)]
+
 # Function to get the directory where the executable/script is located.
 def get_base_dir():
     if getattr(sys, 'frozen', False):
@@ -26,21 +41,15 @@ def get_base_dir():
 # Logging Setup to a Tkinter Text Widget
 # ------------------------------
 class TextHandler(logging.Handler):
-    """A logging handler that outputs to a Tkinter Text widget."""
-    def __init__(self, text_widget):
+    """A logging handler that queues messages for the Tkinter log display (drawn by DataLoaderGUI.flush_log)."""
+    def __init__(self, log_buffer):
         super().__init__()
-        self.text_widget = text_widget
+        self.log_buffer = log_buffer
 
     def emit(self, record):
-        msg = self.format(record)
-        def append():
-            self.text_widget.configure(state='normal')
-            self.text_widget.insert(tk.END, msg + "\n")
-            self.text_widget.configure(state='disabled')
-            self.text_widget.yview(tk.END)
-        self.text_widget.after(0, append)
-
-def setup_logging(text_widget):
+        self.log_buffer.append(self.format(record) + "\n")
+
+def setup_logging(log_buffer):
     logger = logging.getLogger("DataLoaderGUI")
     logger.setLevel(logging.DEBUG)
     # Clear any existing handlers
@@ -54,7 +63,7 @@ def setup_logging(text_widget):
     console_handler.setLevel(logging.DEBUG)
 
     # Create Text widget handler
-    text_handler = TextHandler(text_widget)
+    text_handler = TextHandler(log_buffer)
     text_handler.setFormatter(formatter)
     text_handler.setLevel(logging.INFO)
 
@@ -87,12 +96,32 @@ class DataLoaderGUI(tk.Tk):
         self.dataloader_button = tk.Button(top_frame, text="Run XMLDataExtractor", command=self.launch_dataloader)
         self.dataloader_button.pack(side="left", padx=10)
         
+        # Per-table progress view: one row per table with rows/sec in a scrolling list of fixed height.
+        self.progress_frame = tk.LabelFrame(self, text="Progress", padx=5, pady=5)
+        self.progress_frame.pack(fill="x", padx=10)
+        self.progress_tree = ttk.Treeview(self.progress_frame, columns=[c for c, _, _ in PROGRESS_COLUMNS],
+                                          show="headings", height=PROGRESS_ROWS)
+        for column, heading, width in PROGRESS_COLUMNS:
+            self.progress_tree.heading(column, text=heading)
+            self.progress_tree.column(column, width=width, anchor="w" if column in ("table", "status") else "e")
+        progress_scrollbar = ttk.Scrollbar(self.progress_frame, orient="vertical", command=self.progress_tree.yview)
+        self.progress_tree.configure(yscrollcommand=progress_scrollbar.set)
+        self.progress_tree.pack(side="left", fill="x", expand=True)
+        progress_scrollbar.pack(side="right", fill="y")
+        self.progress_rows = {}
+
         # Log display (scrolled text widget) with white background.
-        self.log_text = scrolledtext.ScrolledText(self, state="disabled", bg="white", fg="black", width=100, height=30)
-        self.log_text.pack(pady=10, padx=10)
+        self.log_text = scrolledtext.ScrolledText(self, state="disabled", bg="white", fg="black", width=100, height=20)
+        self.log_text.pack(pady=10, padx=10, fill="both", expand=True)
+
+        # Lines from the process and the GUI logger are buffered here and drawn in batches by flush_log.
+        self.log_buffer = deque(maxlen=LOG_BUFFER_LINES)
+        self.dropped_lines = 0
+        self.process_done = False
         
         # Setup logging to the text widget.
-        self.logger = setup_logging(self.log_text)
+        self.logger = setup_logging(self.log_buffer)
+        self.after(LOG_REFRESH_MS, self.flush_log)
     
     def launch_config_editor(self):
         """Launch the configuration editor executable."""
@@ -107,6 +136,7 @@ class DataLoaderGUI(tk.Tk):
         """Launch the dataloader executable and capture its output."""
         try:
             self.dataloader_button.config(state="disabled")
+            self.reset_progress()
             # Assuming dataloader.exe is in the same directory as this executable.
             dataloader_path = os.path.join(get_base_dir(), "XMLDataExtractor.exe")
             # Launch the process without showing a command prompt window.
@@ -130,16 +160,69 @@ class DataLoaderGUI(tk.Tk):
         process.wait()
         # logger.info("ETL process complete for all tables.")
         self.append_log("XMLDataExtractor ETL process complete.\n")
-        self.dataloader_button.config(state="normal")
+        self.process_done = True
     
     def append_log(self, message):
-        """Append a message to the log display in a thread-safe manner."""
-        def update():
+        """Queue a message for the log display; safe to call from any thread."""
+        if len(self.log_buffer) == self.log_buffer.maxlen:
+            # The oldest buffered line is dropped by the deque.
+            self.dropped_lines += 1
+        self.log_buffer.append(message)
+
+    def flush_log(self):
+        """Draw all buffered lines in one batch, trim the widget to LOG_MAX_LINES and update progress bars."""
+        lines = []
+        while self.log_buffer:
+            try:
+                lines.append(self.log_buffer.popleft())
+            except IndexError:
+                break
+        if self.dropped_lines:
+            lines.insert(0, f"... {self.dropped_lines} log lines skipped ...\n")
+            self.dropped_lines = 0
+        if lines:
+            for line in lines:
+                self.update_progress(line)
             self.log_text.configure(state="normal")
-            self.log_text.insert(tk.END, message)
+            self.log_text.insert(tk.END, "".join(lines))
+            excess = int(self.log_text.index("end-1c").split(".")[0]) - LOG_MAX_LINES
+            if excess > 0:
+                self.log_text.delete("1.0", f"{excess + 1}.0")
             self.log_text.configure(state="disabled")
             self.log_text.yview(tk.END)
-        self.log_text.after(0, update)
+        if self.process_done:
+            self.process_done = False
+            self.dataloader_button.config(state="normal")
+        self.after(LOG_REFRESH_MS, self.flush_log)
+
+    def reset_progress(self):
+        """Remove the progress rows of a previous run."""
+        self.progress_tree.delete(*self.progress_tree.get_children())
+        self.progress_rows.clear()
+
+    def set_progress_row(self, target_table, percent="", rows="", rate="", status=""):
+        """Add or update the row of a table and scroll it into view (the active table is the latest one)."""
+        values = (target_table, percent, rows, rate, status)
+        item = self.progress_rows.get(target_table)
+        if item is None:
+            item = self.progress_tree.insert("", tk.END, values=values)
+            self.progress_rows[target_table] = item
+        else:
+            self.progress_tree.item(item, values=values)
+        self.progress_tree.see(item)
+
+    def update_progress(self, line):
+        """Update the progress view from a data loader log line."""
+        match = TABLE_START_RE.search(line)
+        if match:
+            if match.group(2) not in self.progress_rows:
+                self.set_progress_row(match.group(2), status="extracting...")
+            return
+        match = PROGRESS_RE.search(line)
+        if match:
+            target_table, done, total, rate = match.group(1), int(match.group(2)), int(match.group(3)), match.group(4)
+            self.set_progress_row(target_table, f"{100 * done // max(total, 1)}%", f"{done}/{total}", rate,
+                                  "done" if done >= total else "loading...")
 
 if __name__ == '__main__':
     app = DataLoaderGUI()